@@ -0,0 +1,86 @@
+from sqlalchemy import update
+
+from models import db, ItemInspecaoApontado
+
+# ==============================================================================
+# Gravação do checklist de uma ordem em lote (número constante de consultas)
+# ==============================================================================
+CAMPOS_NAO_CONFORMIDADE = ('falha', 'solucao', 'tempo_necessario', 'qtde_executantes', 'materiais', 'outros')
+
+def _numero(valor, tipo=float):
+    return tipo(valor) if valor else None
+
+def valores_apontamento(form, item_id):
+    """Campos do apontamento de um item enviados pelo formulário de execução.
+
+    Os campos de não conformidade só são informados (e portanto gravados)
+    quando o resultado é 'nao_conforme'; nos demais casos ficam como estão.
+    """
+    resultado = form.get(f'resultado_{item_id}')
+    valores = {
+        'resultado': resultado,
+        'observacao': form.get(f'observacao_{item_id}'),
+        'valor_atual': _numero(form.get(f'valor_atual_{item_id}')),
+    }
+    if resultado == 'nao_conforme':
+        valores.update({
+            'falha': form.get(f'falha_{item_id}'),
+            'solucao': form.get(f'solucao_{item_id}'),
+            'tempo_necessario': _numero(form.get(f'tempo_{item_id}')),
+            'qtde_executantes': _numero(form.get(f'qtde_{item_id}'), int),
+            'materiais': form.get(f'materiais_{item_id}'),
+            'outros': form.get(f'outros_{item_id}'),
+        })
+    return valores
+
+def _insert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def _por_campos(linhas):
+    """Agrupa as linhas pelo conjunto de colunas (cada grupo vira um executemany)"""
+    grupos = {}
+    for linha in linhas:
+        grupos.setdefault(tuple(sorted(linha)), []).append(linha)
+    return grupos.values()
+
+def _inserir(linhas):
+    """INSERT em lote; ON CONFLICT (ordem_id, item_inspecao_id) cobre dois salvamentos simultâneos"""
+    insert = _insert()
+    for grupo in _por_campos(linhas):
+        stmt = insert(ItemInspecaoApontado.__table__)
+        campos = [campo for campo in grupo[0] if campo not in ('ordem_id', 'item_inspecao_id')]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ordem_id', 'item_inspecao_id'],
+            set_={campo: stmt.excluded[campo] for campo in campos}
+        )
+        db.session.execute(stmt, grupo)
+
+def _atualizar(linhas):
+    """UPDATE em lote pela chave primária"""
+    for grupo in _por_campos(linhas):
+        db.session.execute(update(ItemInspecaoApontado), grupo)
+
+def salvar_apontamentos(ordem, itens, form):
+    """Grava os apontamentos de todos os itens do checklist: uma consulta para os existentes,
+    um INSERT em lote para os novos e um UPDATE em lote para os demais."""
+    existentes = dict(db.session.execute(
+        db.select(ItemInspecaoApontado.item_inspecao_id, ItemInspecaoApontado.id)
+        .where(ItemInspecaoApontado.ordem_id == ordem.id)
+    ).all())
+
+    novos, alterados = [], []
+    for item in itens:
+        valores = valores_apontamento(form, item.id)
+        if item.id in existentes:
+            alterados.append({'id': existentes[item.id], **valores})
+        else:
+            novos.append({'ordem_id': ordem.id, 'item_inspecao_id': item.id, **valores})
+
+    if novos:
+        _inserir(novos)
+    if alterados:
+        _atualizar(alterados)
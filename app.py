@@ -3,6 +3,17 @@ from config import Config
 from flask_migrate import Migrate
 from models import db, login_manager
 from routes import main_bp
+from benchmark import benchmark_command
+from carga import teste_carga_command
+from dados_sinteticos import gerar_dados_sinteticos_command
+from dashboard import reconstruir_resumo_mensal_command
+from diagnostico_sql import instalar_diagnostico_sql
+from replica import instalar_replica
+from geracao_ordens import gerar_ordens_command
+from hierarquia import reconstruir_caminhos_command
+from importacao_hierarquia import importar_hierarquia_command
+from importacao_usuarios import importar_usuarios_command
+from inicializacao import tempo_inicializacao_command
 
 def create_app():
     app = Flask(__name__)
@@ -17,9 +28,21 @@ def create_app():
     migrate = Migrate(app, db)
     
     app.register_blueprint(main_bp)
+    instalar_diagnostico_sql(app)
+    instalar_replica(app)
+    app.cli.add_command(reconstruir_resumo_mensal_command)
+    app.cli.add_command(gerar_ordens_command)
+    app.cli.add_command(reconstruir_caminhos_command)
+    app.cli.add_command(importar_hierarquia_command)
+    app.cli.add_command(importar_usuarios_command)
+    app.cli.add_command(gerar_dados_sinteticos_command)
+    app.cli.add_command(benchmark_command)
+    app.cli.add_command(teste_carga_command)
+    app.cli.add_command(tempo_inicializacao_command)
     
-    with app.app_context():
-        db.create_all()
+    if app.config['CRIAR_TABELAS_NA_INICIALIZACAO']:
+        with app.app_context():
+            db.create_all()
     
     return app
 
@@ -0,0 +1,258 @@
+import json
+import math
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app, render_template
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+from dados_sinteticos import USUARIO_ADMIN, SENHA_SINTETICA, PREFIXO_EXECUTANTE
+from models import db, User, Empresa, Equipamento, ItemInspecao, OrdemExecucao
+from utils import pdf_do_html
+
+# ==============================================================================
+# Benchmark das rotas principais (latência e consultas por cenário)
+# ==============================================================================
+# Caches desligados com --sem-cache (mede o custo real de cada requisição)
+CONFIG_SEM_CACHE = {'DASHBOARD_CACHE_TTL': 0, 'HIERARQUIA_CACHE_TTL': 0, 'USUARIO_CACHE_TTL': 0}
+# As rotas de PDF só agendam a renderização (fila_pdf.py); o WeasyPrint é medido à parte
+CENARIO_RENDERIZACAO = 'renderização: relatorio_ordem'
+
+def _contexto():
+    """Ids usados pelos cenários (da planta sintética; ver dados_sinteticos.py)"""
+    ordem_concluida = db.session.scalar(
+        db.select(OrdemExecucao.id).where(OrdemExecucao.tipo_ordem == 'programada', OrdemExecucao.status == 'concluida')
+        .order_by(OrdemExecucao.id).limit(1)
+    )
+    if ordem_concluida is None:
+        raise click.ClickException('Sem ordens concluídas: gere a planta com `flask gerar-dados-sinteticos`.')
+    ordem = db.session.get(OrdemExecucao, ordem_concluida)
+    executante = db.session.scalar(db.select(User.id).where(User.username == f'{PREFIXO_EXECUTANTE}1'))
+    pendentes = db.session.scalars(
+        db.select(OrdemExecucao.id).where(OrdemExecucao.tipo_ordem == 'programada', OrdemExecucao.status == 'pendente')
+        .order_by(OrdemExecucao.id).limit(200)
+    ).all() or [ordem.id]
+    itens = {}
+    for ordem_id, item_id in db.session.execute(
+        db.select(OrdemExecucao.id, ItemInspecao.id)
+        .join(ItemInspecao, ItemInspecao.plano_id == OrdemExecucao.plano_id)
+        .where(OrdemExecucao.id.in_(pendentes))
+    ):
+        itens.setdefault(ordem_id, []).append(item_id)
+    return {
+        'ordem_id': ordem.id,
+        'plano_id': ordem.plano_id,
+        'equipamento_id': ordem.plano.equipamento_id,
+        'empresa_id': db.session.scalar(db.select(func.min(Empresa.id))),
+        'area_id': db.session.scalar(db.select(Equipamento.area_id).where(Equipamento.id == ordem.plano.equipamento_id)),
+        'executante_id': executante,
+        'execucoes': [(ordem_id, formulario_execucao(itens.get(ordem_id, []))) for ordem_id in pendentes],
+        'desde': (date.today() - timedelta(days=30)).isoformat(),
+    }
+
+def formulario_execucao(itens):
+    # Mesmo formulário da tela executar_ordem, salvando o progresso (a ordem fica em andamento)
+    form = {'servico_executado': 'Inspeção de rotina', 'diagnostico_falha': ''}
+    for item_id in itens:
+        form.update({f'resultado_{item_id}': 'conforme', f'observacao_{item_id}': 'ok', f'valor_atual_{item_id}': '50'})
+    return form
+
+def _cenarios(ctx):
+    """(nome, método, url, dados do POST); url e dados podem ser funções da iteração"""
+    execucoes = ctx['execucoes']
+    return [
+        ('dashboard: resumo', 'GET', '/api/dashboard/resumo', None),
+        ('dashboard: stats', 'GET', '/api/dashboard/stats', None),
+        ('dashboard: ordens', 'GET', '/api/dashboard/ordens', None),
+        ('dashboard: tipo-ordem', 'GET', '/api/dashboard/tipo-ordem', None),
+        ('dashboard: não programadas', 'GET', '/api/dashboard/nao-programadas-status', None),
+        ('index', 'GET', '/', None),
+        ('ordens', 'GET', '/ordens', None),
+        ('ordens: concluídas', 'GET', '/ordens?status=concluida', None),
+        ('mapa anual', 'GET', '/planos/mapa-anual', None),
+        ('ver_empresa', 'GET', f"/empresas/{ctx['empresa_id']}", None),
+        ('api: equipamentos da área', 'GET', f"/api/equipamentos/{ctx['area_id']}", None),
+        ('executar_ordem (POST)', 'POST', lambda i: f'/ordens/{execucoes[i % len(execucoes)][0]}/executar',
+         lambda i: execucoes[i % len(execucoes)][1]),
+        ('pdf: ordem', 'GET', f"/relatorios/ordens/{ctx['ordem_id']}/pdf", None),
+        ('pdf: equipamento', 'GET', f"/relatorios/equipamentos/{ctx['equipamento_id']}/pdf", None),
+        ('excel: ordem', 'GET', f"/relatorios/ordens/{ctx['ordem_id']}/excel", None),
+        ('excel: plano', 'GET', f"/relatorios/planos/{ctx['plano_id']}/excel", None),
+        ('exportação xlsx (30 dias)', 'GET',
+         f"/relatorios/ordens/exportar?formato=xlsx&executante_id={ctx['executante_id']}&data_inicio={ctx['desde']}", None),
+    ]
+
+def percentil(valores, fracao):
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    return valores[max(0, math.ceil(fracao * len(valores)) - 1)]
+
+def _medir(app, cenarios, repeticoes, aquecimento):
+    consultas = [0]
+
+    def contar(*args):
+        consultas[0] += 1
+
+    resultados = {}
+    cliente = app.test_client()
+    resposta = cliente.post('/login', data={'username': USUARIO_ADMIN, 'password': SENHA_SINTETICA})
+    if resposta.status_code != 302:
+        raise click.ClickException(f'Login de {USUARIO_ADMIN} falhou.')
+
+    event.listen(Engine, 'after_cursor_execute', contar)
+    try:
+        for nome, metodo, url, dados in cenarios:
+            tempos, contagens, status = [], [], set()
+            for iteracao in range(aquecimento + repeticoes):
+                caminho = url(iteracao) if callable(url) else url
+                formulario = dados(iteracao) if callable(dados) else dados
+                consultas[0] = 0
+                inicio = time.perf_counter()
+                resposta = cliente.open(caminho, method=metodo, data=formulario)
+                resposta.get_data()  # consome respostas em streaming
+                decorrido = (time.perf_counter() - inicio) * 1000
+                resposta.close()
+                if iteracao >= aquecimento:
+                    tempos.append(decorrido)
+                    contagens.append(consultas[0])
+                    status.add(resposta.status_code)
+            resultados[nome] = _estatisticas(tempos, contagens, status)
+    finally:
+        event.remove(Engine, 'after_cursor_execute', contar)
+    return resultados
+
+def _medir_renderizacao(app, ordem_id, repeticoes, aquecimento):
+    """Tempo do HTML para PDF do relatório da ordem, no contexto de renderização reaproveitado"""
+    with app.test_request_context():
+        ordem = db.session.get(OrdemExecucao, ordem_id)
+        html = render_template('relatorio_ordem.html', ordem=ordem, data_geracao=datetime.now(), logo_path=None)
+    tempos = []
+    for iteracao in range(aquecimento + repeticoes):
+        inicio = time.perf_counter()
+        pdf_do_html(html, 'relatorio_ordem.html')
+        if iteracao >= aquecimento:
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return _estatisticas(tempos, [0], {200})
+
+def _estatisticas(tempos, contagens, status):
+    tempos.sort()
+    return {
+        'amostras': len(tempos),
+        'p50_ms': round(percentil(tempos, 0.50), 2),
+        'p95_ms': round(percentil(tempos, 0.95), 2),
+        'p99_ms': round(percentil(tempos, 0.99), 2),
+        'media_ms': round(statistics.fmean(tempos), 2),
+        'max_ms': round(tempos[-1], 2),
+        'consultas': statistics.median_low(contagens),
+        'status': sorted(status),
+    }
+
+def _selecionado(nome, filtro):
+    return not filtro or any(f.lower() in nome.lower() for f in filtro)
+
+def executar_benchmark(repeticoes=20, aquecimento=2, filtro=None, sem_cache=False):
+    """Roda os cenários e retorna {'meta': ..., 'cenarios': {nome: estatísticas}}"""
+    app = current_app._get_current_object()
+    ctx = _contexto()
+    cenarios = [c for c in _cenarios(ctx) if _selecionado(c[0], filtro)]
+    meta = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'banco': db.engine.dialect.name,
+        'ordens': db.session.scalar(db.select(func.count(OrdemExecucao.id))),
+        'equipamentos': db.session.scalar(db.select(func.count(Equipamento.id))),
+        'repeticoes': repeticoes,
+        'sem_cache': sem_cache,
+    }
+    db.session.remove()
+
+    anterior = {chave: app.config.get(chave) for chave in (*CONFIG_SEM_CACHE, 'PDF_CACHE_DIR', 'PDF_ASSINCRONO')}
+    resultado = {}
+    with tempfile.TemporaryDirectory(prefix='plancheck-bench-') as cache_pdf:
+        app.config['PDF_CACHE_DIR'] = cache_pdf
+        # PDFs renderizados na requisição: o diretório temporário não pode sumir com relatórios na fila
+        app.config['PDF_ASSINCRONO'] = False
+        if sem_cache:
+            app.config.update(CONFIG_SEM_CACHE)
+        try:
+            # As requisições rodam em outra thread, sem o app context do comando: cada uma
+            # abre o seu (sessão e `g` novos), como no servidor
+            def medir():
+                medidos = _medir(app, cenarios, repeticoes, aquecimento)
+                if _selecionado(CENARIO_RENDERIZACAO, filtro):
+                    medidos[CENARIO_RENDERIZACAO] = _medir_renderizacao(app, ctx['ordem_id'], repeticoes, aquecimento)
+                resultado['cenarios'] = medidos
+
+            thread = threading.Thread(target=medir)
+            thread.start()
+            thread.join()
+        finally:
+            app.config.update(anterior)
+    if 'cenarios' not in resultado:
+        raise click.ClickException('Benchmark interrompido (ver erro acima).')
+    return {'meta': meta, 'cenarios': resultado['cenarios']}
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _variacao(atual, base):
+    if not base:
+        return ''
+    return f'{(atual - base) / base * 100:+.0f}%'
+
+def formatar_relatorio(resultado, base=None):
+    """Tabela de texto; com `base` (outro resultado) mostra a variação de p50/p95 e de consultas"""
+    meta = resultado['meta']
+    linhas = [f"commit {meta['commit'] or '-'} | {meta['banco']} | {meta['ordens']} ordens | "
+              f"{meta['repeticoes']} repetições{' | sem cache' if meta['sem_cache'] else ''}"]
+    if base:
+        linhas.append(f"comparado com commit {base['meta']['commit'] or '-'} ({base['meta']['data']})")
+    cabecalho = f"{'cenário':<30} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9} {'consultas':>9}"
+    if base:
+        cabecalho += f" {'Δp50':>7} {'Δp95':>7} {'Δconsultas':>10}"
+    linhas += [cabecalho, '-' * len(cabecalho)]
+    for nome, r in resultado['cenarios'].items():
+        linha = (f"{nome:<30} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms "
+                 f"{r['max_ms']:>7.1f}ms {r['consultas']:>9}")
+        if any(s >= 400 for s in r['status']):
+            linha += f"  status {r['status']}"
+        anterior = (base or {}).get('cenarios', {}).get(nome)
+        if anterior:
+            linha += (f" {_variacao(r['p50_ms'], anterior['p50_ms']):>7} {_variacao(r['p95_ms'], anterior['p95_ms']):>7}"
+                      f" {r['consultas'] - anterior['consultas']:>+10}")
+        linhas.append(linha)
+    return '\n'.join(linhas)
+
+@click.command('benchmark')
+@click.option('--repeticoes', type=int, default=20, show_default=True, help='Requisições medidas por cenário')
+@click.option('--aquecimento', type=int, default=2, show_default=True, help='Requisições descartadas por cenário')
+@click.option('--cenario', 'filtro', multiple=True, help='Só os cenários cujo nome contém o texto (repetível)')
+@click.option('--sem-cache', is_flag=True, help='Desliga os caches do dashboard, da hierarquia e do usuário')
+@click.option('--saida', type=click.Path(dir_okay=False, writable=True), help='Grava o resultado em JSON')
+@click.option('--comparar', type=click.Path(exists=True, dir_okay=False), help='JSON de uma execução anterior')
+@with_appcontext
+def benchmark_command(repeticoes, aquecimento, filtro, sem_cache, saida, comparar):
+    """Mede latência (p50/p95/p99) e consultas das rotas principais sobre a planta sintética.
+
+    Atenção: o cenário executar_ordem grava apontamentos; use um banco dedicado.
+    """
+    resultado = executar_benchmark(repeticoes, aquecimento, filtro, sem_cache)
+    base = None
+    if comparar:
+        with open(comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+    click.echo(formatar_relatorio(resultado, base))
+    if saida:
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        click.echo(f'Resultado gravado em {saida}')
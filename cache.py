@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+class CacheTTL:
+    """Cache em memória (por processo) com expiração por tempo e descarte LRU"""
+
+    def __init__(self, ttl=30, max_entradas=1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            entrada = self._dados.get(chave, _AUSENTE)
+            if entrada is _AUSENTE:
+                return padrao
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return padrao
+            self._dados.move_to_end(chave)
+            return valor
+
+    def definir(self, chave, valor, ttl=None):
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._dados[chave] = (expira_em, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None):
+        """Retorna o valor em cache ou calcula, armazena e retorna"""
+        valor = self.obter(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = calcular()
+            self.definir(chave, valor, ttl=ttl)
+        return valor
+
+    def invalidar(self, chave=_AUSENTE):
+        """Remove uma chave (ou todas, se nenhuma for informada)"""
+        with self._lock:
+            if chave is _AUSENTE:
+                self._dados.clear()
+            else:
+                self._dados.pop(chave, None)
+
+    def invalidar_prefixo(self, prefixo):
+        """Remove as chaves-tupla cujo primeiro elemento é `prefixo`"""
+        with self._lock:
+            for chave in [c for c in self._dados if isinstance(c, tuple) and c and c[0] == prefixo]:
+                del self._dados[chave]
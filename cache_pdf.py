@@ -0,0 +1,130 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from flask import current_app, request, send_file, make_response
+
+from contexto_pdf import caminho_css
+
+# ==============================================================================
+# Cache em disco de PDFs renderizados, endereçado pelo conteúdo do relatório
+# ==============================================================================
+def diretorio_cache_pdf():
+    diretorio = current_app.config.get('PDF_CACHE_DIR') or os.path.join(current_app.instance_path, 'cache_pdf')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+def registro_como_dict(registro):
+    """Valores das colunas de um modelo (None se o registro não existir)"""
+    if registro is None:
+        return None
+    return {coluna.key: getattr(registro, coluna.key) for coluna in registro.__table__.columns}
+
+_versoes_template = {}
+
+def versao_template(nome):
+    """Hash do código-fonte do template e da sua folha de estilos (muda a chave quando o layout é alterado)"""
+    env = current_app.jinja_env
+    fonte, caminho, _ = env.loader.get_source(env, nome)
+    css = caminho_css(nome)
+    mtime = os.path.getmtime(caminho) if caminho else None
+    chave = (nome, mtime, os.path.getmtime(css) if css else None)
+    if chave not in _versoes_template:
+        conteudo = hashlib.sha256(fonte.encode('utf-8'))
+        if css:
+            with open(css, 'rb') as arquivo:
+                conteudo.update(arquivo.read())
+        _versoes_template[chave] = conteudo.hexdigest()
+    return _versoes_template[chave]
+
+def assinatura_arquivo(caminho):
+    """Identifica um arquivo (ex.: logo) por nome, tamanho e data de modificação"""
+    if not caminho or not os.path.exists(caminho):
+        return None
+    info = os.stat(caminho)
+    return [os.path.basename(caminho), info.st_size, info.st_mtime_ns]
+
+def chave_conteudo(*partes):
+    """SHA-256 de uma serialização estável das partes do relatório"""
+    serializado = json.dumps(partes, default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+def gravar_atomico(caminho, conteudo):
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def limpar_cache_pdf():
+    """Remove PDFs mais antigos que PDF_CACHE_MAX_DIAS e, se preciso, os menos usados até caber em PDF_CACHE_MAX_MB"""
+    diretorio = diretorio_cache_pdf()
+    max_idade = current_app.config.get('PDF_CACHE_MAX_DIAS', 30) * 86400
+    max_bytes = current_app.config.get('PDF_CACHE_MAX_MB', 500) * 1024 * 1024
+    agora = time.time()
+
+    arquivos = []
+    for entrada in os.scandir(diretorio):
+        if not entrada.name.endswith('.pdf'):
+            # Marcadores da fila de PDFs (fila_pdf.py) esquecidos por um worker que caiu
+            if entrada.name.endswith(('.pendente', '.erro')) and agora - entrada.stat().st_mtime > max_idade:
+                os.remove(entrada.path)
+            continue
+        info = entrada.stat()
+        if agora - info.st_mtime > max_idade:
+            os.remove(entrada.path)
+        else:
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= max_bytes:
+            break
+        os.remove(caminho)
+        total -= tamanho
+
+def caminho_pdf(chave):
+    return os.path.join(diretorio_cache_pdf(), f'{chave}.pdf')
+
+def _resposta_pdf(arquivo, chave, filename):
+    resposta = send_file(arquivo, mimetype='application/pdf', etag=chave, conditional=True, max_age=0)
+    resposta.headers['Content-Disposition'] = f'inline; filename={filename}'
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+def enviar_pdf(chave, filename='relatorio.pdf'):
+    """Responde com o PDF já gravado no cache (304 se o cliente já o tem).
+
+    Retorna None se o arquivo não está no cache, inclusive quando limpar_cache_pdf
+    o removeu depois de quem chamou ter verificado que existia.
+    """
+    if request.if_none_match.contains(chave):
+        resposta = make_response('', 304)
+        resposta.set_etag(chave)
+        return resposta
+
+    caminho = caminho_pdf(chave)
+    try:
+        os.utime(caminho)  # Marca como usado recentemente para a limpeza por tamanho
+        return _resposta_pdf(caminho, chave, filename)
+    except FileNotFoundError:
+        return None
+
+def resposta_pdf_em_cache(chave, renderizar, filename='relatorio.pdf'):
+    """Responde com o PDF da chave: 304 se o cliente já o tem, do disco se já renderizado,
+    ou chamando `renderizar()` (que retorna os bytes do PDF) apenas na primeira vez."""
+    resposta = enviar_pdf(chave, filename)
+    if resposta is not None:
+        return resposta
+    pdf = renderizar()
+    gravar_atomico(caminho_pdf(chave), pdf)
+    limpar_cache_pdf()
+    # Responde com os bytes em memória: a limpeza pode já ter removido o arquivo
+    return _resposta_pdf(io.BytesIO(pdf), chave, filename)
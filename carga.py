@@ -0,0 +1,307 @@
+import json
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import exc
+from werkzeug.serving import make_server
+
+from benchmark import formulario_execucao, percentil
+from dados_sinteticos import USUARIO_ADMIN, SENHA_SINTETICA, PREFIXO_EXECUTANTE
+from models import db, User, ItemInspecao, OrdemExecucao
+
+# ==============================================================================
+# Teste de carga: executantes salvando checklists e admins com o dashboard aberto
+# ==============================================================================
+# Ordens de cada executante usadas no fluxo de execução (ciclo)
+ORDENS_POR_EXECUTANTE = 50
+TIMEOUT_REQUISICAO = 60
+
+class _SemRedirecionamento(HTTPRedirectHandler):
+    # O redirecionamento após login/POST é registrado como resposta própria (302), não seguido
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class _Cliente:
+    """Sessão HTTP de um usuário virtual (cookies próprios); registra cada requisição em `amostras`"""
+
+    def __init__(self, base, amostras):
+        self.base = base.rstrip('/')
+        self.amostras = amostras
+        self._opener = build_opener(HTTPCookieProcessor(CookieJar()), _SemRedirecionamento())
+
+    def requisitar(self, acao, caminho, dados=None):
+        corpo = urlencode(dados).encode() if dados is not None else None
+        inicio = time.perf_counter()
+        try:
+            with self._opener.open(self.base + caminho, data=corpo, timeout=TIMEOUT_REQUISICAO) as resposta:
+                resposta.read()
+                status = resposta.status
+        except HTTPError as erro:
+            erro.read()
+            status = erro.code
+        except (URLError, OSError):
+            status = 0  # conexão recusada/timeout
+        self.amostras.append((acao, (time.perf_counter() - inicio) * 1000, status))
+        return status
+
+    def login(self, usuario):
+        return self.requisitar('login', '/login', {'username': usuario, 'password': SENHA_SINTETICA}) == 302
+
+def _erro(status):
+    return status == 0 or status >= 400
+
+# ------------------------------------------------------------------------------
+# Fluxos
+# ------------------------------------------------------------------------------
+def _fluxo_executante(cliente, usuario, execucoes, fim, pausa, aleatorio):
+    """Lista as ordens, abre o checklist, salva o progresso e volta para a ordem"""
+    if not cliente.login(usuario):
+        return
+    indice = aleatorio.randrange(len(execucoes)) if execucoes else 0
+    while time.monotonic() < fim:
+        cliente.requisitar('ordens', '/ordens')
+        if execucoes:
+            ordem_id, formulario = execucoes[indice % len(execucoes)]
+            indice += 1
+            time.sleep(aleatorio.uniform(0, pausa))
+            cliente.requisitar('executar_ordem', f'/ordens/{ordem_id}/executar')
+            time.sleep(aleatorio.uniform(0, pausa))
+            cliente.requisitar('executar_ordem (POST)', f'/ordens/{ordem_id}/executar', formulario)
+            cliente.requisitar('ver_ordem', f'/ordens/{ordem_id}')
+        time.sleep(aleatorio.uniform(0, pausa))
+
+def _fluxo_admin(cliente, fim, intervalo, aleatorio):
+    """Mantém o index aberto: recarrega a página e as APIs que ela consulta a cada `intervalo`"""
+    if not cliente.login(USUARIO_ADMIN):
+        return
+    while time.monotonic() < fim:
+        cliente.requisitar('index', '/')
+        cliente.requisitar('dashboard: resumo', '/api/dashboard/resumo')
+        cliente.requisitar('dashboard: ordens', '/api/dashboard/ordens')
+        time.sleep(intervalo * aleatorio.uniform(0.8, 1.2))
+
+def _execucoes_por_executante():
+    """{username: [(ordem_id, formulário do checklist)]} com as ordens abertas de cada executante sintético"""
+    usuarios = dict(db.session.execute(
+        db.select(User.id, User.username).where(User.username.startswith(PREFIXO_EXECUTANTE)).order_by(User.id)
+    ).all())
+    if not usuarios:
+        raise click.ClickException('Sem executantes sintéticos: gere a planta com `flask gerar-dados-sinteticos`.')
+    ordens = {}
+    for ordem_id, executante_id in db.session.execute(
+        db.select(OrdemExecucao.id, OrdemExecucao.executante_id)
+        .where(OrdemExecucao.executante_id.in_(usuarios), OrdemExecucao.tipo_ordem == 'programada',
+               OrdemExecucao.status.in_(('pendente', 'em_andamento')))
+        .order_by(OrdemExecucao.data_programada, OrdemExecucao.id)
+    ):
+        lista = ordens.setdefault(executante_id, [])
+        if len(lista) < ORDENS_POR_EXECUTANTE:
+            lista.append(ordem_id)
+    itens = {}
+    for ordem_id, item_id in db.session.execute(
+        db.select(OrdemExecucao.id, ItemInspecao.id)
+        .join(ItemInspecao, ItemInspecao.plano_id == OrdemExecucao.plano_id)
+        .where(OrdemExecucao.id.in_([o for lista in ordens.values() for o in lista]))
+    ):
+        itens.setdefault(ordem_id, []).append(item_id)
+    return {
+        username: [(ordem_id, formulario_execucao(itens.get(ordem_id, []))) for ordem_id in ordens.get(user_id, [])]
+        for user_id, username in usuarios.items()
+    }
+
+# ------------------------------------------------------------------------------
+# Pool de conexões
+# ------------------------------------------------------------------------------
+@contextmanager
+def _medir_pool(engine):
+    """Tempo de espera por conexão em cada checkout do pool (servidor no mesmo processo)"""
+    pool = engine.pool
+    medicao = {'esperas': [], 'timeouts': 0, 'max_em_uso': 0}
+    obter = pool._do_get
+
+    def obter_medindo():
+        inicio = time.perf_counter()
+        try:
+            conexao = obter()
+        except exc.TimeoutError:
+            medicao['timeouts'] += 1
+            raise
+        medicao['esperas'].append((time.perf_counter() - inicio) * 1000)
+        medicao['max_em_uso'] = max(medicao['max_em_uso'], pool.checkedout())
+        return conexao
+
+    pool._do_get = obter_medindo
+    try:
+        yield medicao
+    finally:
+        del pool._do_get
+
+@contextmanager
+def _servidor_local(app, porta):
+    servidor = make_server('127.0.0.1', porta, app, threaded=True)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{servidor.server_port}'
+    finally:
+        servidor.shutdown()
+        thread.join()
+
+# ------------------------------------------------------------------------------
+# Execução e relatório
+# ------------------------------------------------------------------------------
+def _estatisticas(tempos):
+    tempos = sorted(tempos)
+    if not tempos:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    return {
+        'p50_ms': round(percentil(tempos, 0.50), 1),
+        'p95_ms': round(percentil(tempos, 0.95), 1),
+        'p99_ms': round(percentil(tempos, 0.99), 1),
+        'max_ms': round(tempos[-1], 1),
+    }
+
+def _resumir(amostras, duracao):
+    por_acao = {}
+    for acao, tempo, status in amostras:
+        por_acao.setdefault(acao, []).append((tempo, status))
+    acoes = {}
+    for acao, registros in por_acao.items():
+        erros = sum(_erro(status) for _, status in registros)
+        acoes[acao] = {
+            'requisicoes': len(registros),
+            'por_segundo': round(len(registros) / duracao, 2),
+            'erros': erros,
+            'taxa_erro': round(erros / len(registros), 4),
+            'status': sorted({status for _, status in registros}),
+            **_estatisticas([tempo for tempo, _ in registros]),
+        }
+    erros = sum(a['erros'] for a in acoes.values())
+    return {
+        'requisicoes': len(amostras),
+        'por_segundo': round(len(amostras) / duracao, 2),
+        'erros': erros,
+        'taxa_erro': round(erros / len(amostras), 4) if amostras else 0,
+        **_estatisticas([tempo for _, tempo, _ in amostras]),
+        'acoes': acoes,
+    }
+
+def executar_carga(executantes=20, admins=5, duracao=60, pausa=2.0, intervalo_admin=10.0, url=None, porta=0,
+                   semente=42):
+    """Sobe o app localmente (ou usa `url`) e roda N executantes e M admins por `duracao` segundos.
+
+    Retorna {'meta', 'geral', 'pool'}; 'pool' só é medido com o servidor no mesmo processo.
+    """
+    app = current_app._get_current_object()
+    execucoes = _execucoes_por_executante()
+    usernames = sorted(execucoes)
+    opcoes_pool = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    meta = {
+        'executantes': executantes, 'admins': admins, 'duracao_s': duracao, 'pausa_s': pausa,
+        'intervalo_admin_s': intervalo_admin, 'url': url or 'local',
+        'pool_size': opcoes_pool.get('pool_size'), 'max_overflow': opcoes_pool.get('max_overflow'),
+        'banco': db.engine.dialect.name,
+    }
+    engine = db.engine
+    db.session.remove()
+
+    amostras_por_usuario = []
+    threads = []
+    aleatorio = random.Random(semente)
+
+    def rodar(base, fim):
+        for n in range(executantes + admins):
+            amostras = []
+            amostras_por_usuario.append(amostras)
+            cliente = _Cliente(base, amostras)
+            rng = random.Random(aleatorio.random())
+            if n < executantes:
+                usuario = usernames[n % len(usernames)]
+                alvo, argumentos = _fluxo_executante, (cliente, usuario, execucoes[usuario], fim, pausa, rng)
+            else:
+                alvo, argumentos = _fluxo_admin, (cliente, fim, intervalo_admin, rng)
+            threads.append(threading.Thread(target=alvo, args=argumentos, daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    if url:
+        inicio = time.monotonic()
+        rodar(url, inicio + duracao)
+        pool = None
+    else:
+        with _servidor_local(app, porta) as base, _medir_pool(engine) as medicao:
+            inicio = time.monotonic()
+            rodar(base, inicio + duracao)
+        pool = {
+            'checkouts': len(medicao['esperas']),
+            'timeouts': medicao['timeouts'],
+            'max_em_uso': medicao['max_em_uso'],
+            'espera_media_ms': round(statistics.fmean(medicao['esperas']), 2) if medicao['esperas'] else None,
+            **_estatisticas(medicao['esperas']),
+        }
+    decorrido = time.monotonic() - inicio
+    amostras = [amostra for lista in amostras_por_usuario for amostra in lista]
+    meta['decorrido_s'] = round(decorrido, 1)
+    return {'meta': meta, 'geral': _resumir(amostras, decorrido), 'pool': pool}
+
+def _ms(valor):
+    return '-' if valor is None else f'{valor:.1f}ms'
+
+def formatar_relatorio_carga(resultado):
+    meta, geral, pool = resultado['meta'], resultado['geral'], resultado['pool']
+    linhas = [
+        f"{meta['executantes']} executantes + {meta['admins']} admins por {meta['decorrido_s']}s | {meta['url']} | "
+        f"{meta['banco']} | pool_size {meta['pool_size']} + max_overflow {meta['max_overflow']}",
+        f"{geral['requisicoes']} requisições, {geral['por_segundo']} req/s, p95 {_ms(geral['p95_ms'])}, "
+        f"p99 {_ms(geral['p99_ms'])}, erros {geral['erros']} ({geral['taxa_erro']:.2%})",
+    ]
+    cabecalho = f"{'ação':<24} {'req':>6} {'req/s':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9} {'erros':>7}"
+    linhas += ['', cabecalho, '-' * len(cabecalho)]
+    for acao, r in geral['acoes'].items():
+        linha = (f"{acao:<24} {r['requisicoes']:>6} {r['por_segundo']:>7.2f} {_ms(r['p50_ms']):>9} "
+                 f"{_ms(r['p95_ms']):>9} {_ms(r['p99_ms']):>9} {_ms(r['max_ms']):>9} {r['taxa_erro']:>7.1%}")
+        if r['erros']:
+            linha += f"  status {r['status']}"
+        linhas.append(linha)
+    if pool:
+        linhas += ['', f"pool: {pool['checkouts']} checkouts, espera média {_ms(pool['espera_media_ms'])}, "
+                       f"p95 {_ms(pool['p95_ms'])}, p99 {_ms(pool['p99_ms'])}, máx {_ms(pool['max_ms'])}, "
+                       f"máx. em uso {pool['max_em_uso']}, timeouts {pool['timeouts']}"]
+    else:
+        linhas += ['', 'pool: não medido (servidor externo; ver /admin/diagnostico-sql no servidor)']
+    return '\n'.join(linhas)
+
+@click.command('teste-carga')
+@click.option('--executantes', type=int, default=20, show_default=True, help='Usuários executando ordens')
+@click.option('--admins', type=int, default=5, show_default=True, help='Usuários com o dashboard aberto')
+@click.option('--duracao', type=int, default=60, show_default=True, help='Segundos de carga')
+@click.option('--pausa', type=float, default=2.0, show_default=True, help='Pausa máxima entre ações do executante (s)')
+@click.option('--intervalo-admin', type=float, default=10.0, show_default=True,
+              help='Intervalo entre atualizações do dashboard (s)')
+@click.option('--url', help='Servidor já em execução (ex.: http://127.0.0.1:8000); sem ela o app sobe localmente')
+@click.option('--porta', type=int, default=0, help='Porta do servidor local (0 = livre)')
+@click.option('--saida', type=click.Path(dir_okay=False, writable=True), help='Grava o resultado em JSON')
+@with_appcontext
+def teste_carga_command(executantes, admins, duracao, pausa, intervalo_admin, url, porta, saida):
+    """Teste de carga concorrente sobre a planta sintética (vazão, p95/p99, espera do pool e erros).
+
+    Atenção: os executantes gravam apontamentos; use um banco dedicado.
+    """
+    resultado = executar_carga(executantes, admins, duracao, pausa, intervalo_admin, url, porta)
+    click.echo(formatar_relatorio_carga(resultado))
+    if saida:
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        click.echo(f'Resultado gravado em {saida}')
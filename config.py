@@ -7,6 +7,60 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'pool_size': 10,
-        'max_overflow': 20
+        # No gunicorn (gunicorn.conf.py) os dois são derivados de DB_MAX_CONEXOES por worker
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
     }
+    # Réplica de leitura opcional: dashboard, relatórios e exportações (@leitura_replica em
+    # routes.py) leem dela, sem disputar o pool do primário com as gravações. Quem acabou de
+    # gravar lê do primário por REPLICA_ATRASO_MAX segundos; os caches do dashboard só são
+    # preenchidos por leituras do primário
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': {'url': DATABASE_REPLICA_URL, **SQLALCHEMY_ENGINE_OPTIONS}} if DATABASE_REPLICA_URL else {}
+    REPLICA_ATRASO_MAX = int(os.environ.get('REPLICA_ATRASO_MAX', 10))
+
+    # Dashboard: lê a série mensal da tabela ordem_resumo_mensal (mantida a cada flush)
+    # em vez de agregar ordem_execucao. Ao habilitar, rodar `flask reconstruir-resumo-mensal`.
+    DASHBOARD_RESUMO_MENSAL = os.environ.get('DASHBOARD_RESUMO_MENSAL', '').lower() in ('1', 'true', 'sim')
+    # Tempo (segundos) de cache das APIs do dashboard; 0 desativa o cache
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+    # Paginação por cursor das listas de ordens
+    ORDENS_POR_PAGINA = int(os.environ.get('ORDENS_POR_PAGINA', 50))
+    ORDENS_POR_PAGINA_MAX = int(os.environ.get('ORDENS_POR_PAGINA_MAX', 200))
+    # Cache em disco dos PDFs de ordens (chave = hash do conteúdo do relatório).
+    # Vazio usa instance/cache_pdf; a limpeza remove arquivos antigos e os menos usados além do limite.
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+    PDF_CACHE_MAX_MB = int(os.environ.get('PDF_CACHE_MAX_MB', 500))
+    PDF_CACHE_MAX_DIAS = int(os.environ.get('PDF_CACHE_MAX_DIAS', 30))
+    # Renderização dos PDFs fora da requisição (fila_pdf.py): a rota agenda e responde 202 com
+    # uma página que aguarda o arquivo. PDF_PROCESSOS processos de renderização por worker;
+    # com PDF_FILA_MAX relatórios pendentes no worker novas solicitações recebem 503.
+    # PDF_TEMPO_MAXIMO (s) descarta agendamentos de um worker que caiu. 0 em PDF_ASSINCRONO
+    # renderiza na própria requisição
+    PDF_ASSINCRONO = os.environ.get('PDF_ASSINCRONO', '1').lower() in ('1', 'true', 'sim')
+    PDF_PROCESSOS = int(os.environ.get('PDF_PROCESSOS', 1))
+    PDF_FILA_MAX = int(os.environ.get('PDF_FILA_MAX', 20))
+    PDF_TEMPO_MAXIMO = int(os.environ.get('PDF_TEMPO_MAXIMO', 300))
+    # Cache (segundos) das APIs de cascata /api/setores, /api/areas e /api/equipamentos;
+    # o cache é limpo a cada alteração na hierarquia, mas só no worker que a fez: nos demais a
+    # lista antiga vale até o TTL. 0 desativa
+    HIERARQUIA_CACHE_TTL = int(os.environ.get('HIERARQUIA_CACHE_TTL', 10))
+    # Cache (segundos) do usuário logado carregado a cada requisição (id, username, nome);
+    # limpo ao editar/excluir o usuário. O perfil (permissão) é sempre lido do banco. 0 desativa
+    USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', 60))
+    # Algoritmo e custo do hash de senhas (formato do werkzeug, ex.: 'scrypt:32768:8:1' ou
+    # 'pbkdf2:sha256:600000'). Custos menores reduzem a latência do login; senhas com outro
+    # método são regravadas no próximo login
+    SENHA_HASH_METODO = os.environ.get('SENHA_HASH_METODO', 'scrypt:32768:8:1')
+    # Processos usados para gerar os hashes na importação de usuários (vazio = nº de CPUs)
+    IMPORTACAO_USUARIOS_PROCESSOS = int(os.environ.get('IMPORTACAO_USUARIOS_PROCESSOS', 0)) or None
+    # Instrumentação de SQL por requisição (header Server-Timing para administradores e
+    # /admin/diagnostico-sql). Registra um aviso no log quando a rota passa do limite de consultas
+    # ou repete a mesma consulta. Desligada por padrão: ative no desenvolvimento ou para investigar.
+    # Exportações em streaming não são medidas (consultam o banco depois do after_request)
+    DIAGNOSTICO_SQL = os.environ.get('DIAGNOSTICO_SQL', '').lower() in ('1', 'true', 'sim')
+    DIAGNOSTICO_SQL_LIMITE_CONSULTAS = int(os.environ.get('DIAGNOSTICO_SQL_LIMITE_CONSULTAS', 20))
+    DIAGNOSTICO_SQL_REPETICOES = int(os.environ.get('DIAGNOSTICO_SQL_REPETICOES', 5))
+    # db.create_all() a cada início do app (consulta o catálogo do banco em todo worker).
+    # Em produção use 0 e deixe o schema com o Flask-Migrate (`flask db upgrade` no deploy)
+    CRIAR_TABELAS_NA_INICIALIZACAO = os.environ.get('CRIAR_TABELAS_NA_INICIALIZACAO', '1').lower() in ('1', 'true', 'sim')
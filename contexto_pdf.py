@@ -0,0 +1,110 @@
+import mimetypes
+import os
+import threading
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+# ==============================================================================
+# Contexto de renderização do WeasyPrint reaproveitado entre relatórios
+# ==============================================================================
+# Fontes descobertas uma vez, folhas de estilo dos relatórios já interpretadas e
+# arquivos locais (logos, imagens de static/) servidos da memória. Um contexto por
+# thread: FontConfiguration e CSS não são seguros para uso simultâneo. No pool de
+# PDFs (fila_pdf.py) isso significa um por processo, criado ao iniciar o processo.
+DIRETORIO_CSS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'css', 'relatorios')
+# Imagens decodificadas mantidas pelo WeasyPrint (opção `cache`) antes de esvaziar
+MAX_IMAGENS = 64
+# Arquivos maiores que isso são lidos do disco a cada uso
+MAX_ARQUIVO_BYTES = 5 * 1024 * 1024
+
+_local = threading.local()
+
+def caminho_css(template):
+    """Folha de estilos do relatório (static/css/relatorios/<template>.css) ou None"""
+    caminho = os.path.join(DIRETORIO_CSS, os.path.splitext(template)[0] + '.css')
+    return caminho if os.path.exists(caminho) else None
+
+def _caminho_local(url):
+    if not url.lower().startswith('file:'):
+        return None
+    return url2pathname(urlsplit(url).path)
+
+def _criar_url_fetcher(ler_arquivo):
+    """URL fetcher que serve arquivos locais por `ler_arquivo` e delega o resto ao padrão"""
+    try:
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        # Versões anteriores do WeasyPrint: o fetcher é uma função que retorna um dict
+        from weasyprint.urls import default_url_fetcher
+
+        def buscar(url):
+            caminho = _caminho_local(url)
+            if caminho is None:
+                return default_url_fetcher(url)
+            dados, mime = ler_arquivo(caminho)
+            return {'string': dados, 'mime_type': mime, 'redirected_url': url}
+        return buscar
+
+    class BuscadorEmMemoria(URLFetcher):
+        def fetch(self, url, headers=None):
+            caminho = _caminho_local(url)
+            if caminho is None:
+                return super().fetch(url, headers)
+            dados, mime = ler_arquivo(caminho)
+            return URLFetcherResponse(url, body=dados, headers={'Content-Type': mime} if mime else None)
+    return BuscadorEmMemoria()
+
+class ContextoPDF:
+    def __init__(self):
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.font_config = FontConfiguration()
+        self.url_fetcher = _criar_url_fetcher(self._ler_arquivo)
+        self._folhas = {}    # caminho -> (mtime, CSS)
+        self._arquivos = {}  # caminho -> (mtime, tamanho, bytes, mime)
+        self._imagens = {}
+
+    def _ler_arquivo(self, caminho):
+        """(bytes, mime) de um arquivo local; da memória enquanto não mudar no disco"""
+        info = os.stat(caminho)
+        em_cache = self._arquivos.get(caminho)
+        if em_cache is not None and em_cache[:2] == (info.st_mtime_ns, info.st_size):
+            return em_cache[2], em_cache[3]
+        if em_cache is not None:
+            self._imagens.clear()  # o WeasyPrint guarda as imagens pela URL, que não mudou
+        with open(caminho, 'rb') as arquivo:
+            dados = arquivo.read()
+        mime = mimetypes.guess_type(caminho)[0]
+        if info.st_size <= MAX_ARQUIVO_BYTES:
+            self._arquivos[caminho] = (info.st_mtime_ns, info.st_size, dados, mime)
+        return dados, mime
+
+    def folhas_de_estilo(self, template):
+        """[CSS] pré-interpretado do relatório (recarregado se o arquivo mudar)"""
+        from weasyprint import CSS
+
+        caminho = caminho_css(template) if template else None
+        if caminho is None:
+            return []
+        mtime = os.stat(caminho).st_mtime_ns
+        em_cache = self._folhas.get(caminho)
+        if em_cache is None or em_cache[0] != mtime:
+            em_cache = (mtime, CSS(filename=caminho, font_config=self.font_config, url_fetcher=self.url_fetcher))
+            self._folhas[caminho] = em_cache
+        return [em_cache[1]]
+
+    def renderizar(self, html, template=None):
+        from weasyprint import HTML
+
+        if len(self._imagens) > MAX_IMAGENS:
+            self._imagens.clear()
+        documento = HTML(string=html, url_fetcher=self.url_fetcher)
+        return documento.write_pdf(stylesheets=self.folhas_de_estilo(template), font_config=self.font_config,
+                                   cache=self._imagens)
+
+def contexto_pdf():
+    """Contexto de renderização da thread atual (criado no primeiro uso)"""
+    contexto = getattr(_local, 'contexto', None)
+    if contexto is None:
+        contexto = _local.contexto = ContextoPDF()
+    return contexto
@@ -0,0 +1,116 @@
+from datetime import date, datetime, time, timedelta
+
+# ==============================================================================
+# Cronograma de execução dos planos (cálculo aritmético, sem iteração por ocorrência)
+# ==============================================================================
+UMA_SEMANA = timedelta(days=7)
+
+def numero_semanas_iso(ano):
+    """Quantidade de semanas ISO 8601 do ano (52 ou 53)"""
+    # 28/12 sempre pertence à última semana ISO do próprio ano
+    return date(ano, 12, 28).isocalendar()[1]
+
+def semanas_do_ano(ano):
+    """Semanas ISO do ano com início (segunda), fim (domingo) e mês de referência"""
+    segunda = date.fromisocalendar(ano, 1, 1)
+    semanas = []
+    for numero in range(1, numero_semanas_iso(ano) + 1):
+        semanas.append({
+            'numero': numero,
+            'inicio': segunda,
+            'fim': segunda + timedelta(days=6),
+            'mes': segunda.strftime('%b')
+        })
+        segunda += UMA_SEMANA
+    return semanas
+
+def _como_datetime(valor):
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.combine(valor, time.min)
+
+# O formulário de planos grava 'horario' para geração por hora; 'por_hora' é o nome usado nos cálculos
+SINONIMOS_TIPO_GERACAO = {'horario': 'por_hora'}
+
+def normalizar_tipo_geracao(tipo_geracao):
+    """Tipo de geração do plano no vocabulário dos cálculos de cronograma"""
+    return SINONIMOS_TIPO_GERACAO.get(tipo_geracao, tipo_geracao)
+
+def passo_do_plano(tipo_geracao, frequencia):
+    """Intervalo entre execuções do plano, ou None se o plano não se repete"""
+    if not frequencia or frequencia <= 0:
+        return None
+    tipo_geracao = normalizar_tipo_geracao(tipo_geracao)
+    if tipo_geracao == 'diario':
+        return timedelta(days=max(int(frequencia), 1))
+    if tipo_geracao == 'por_hora':
+        return timedelta(hours=frequencia)
+    return None
+
+def primeira_execucao(tipo_geracao, data_inicio):
+    """Instante da primeira execução (planos diários contam a partir da data, sem hora)"""
+    if tipo_geracao == 'diario':
+        return _como_datetime(data_inicio.date() if isinstance(data_inicio, datetime) else data_inicio)
+    return _como_datetime(data_inicio)
+
+def indices_execucao(inicio, passo, limite_inferior, limite_superior):
+    """Intervalo [k0, k1] de ocorrências inicio + k*passo dentro dos limites (inclusive)"""
+    if inicio > limite_superior:
+        return None
+    k0 = 0 if inicio >= limite_inferior else -((inicio - limite_inferior) // passo)
+    k1 = (limite_superior - inicio) // passo
+    if k0 > k1:
+        return None
+    return k0, k1
+
+def semanas_execucao(tipo_geracao, frequencia, data_inicio, ano):
+    """Números das semanas ISO de `ano` em que o plano tem ao menos uma execução.
+
+    Considera apenas execuções dentro do ano civil (01/01 a 31/12) e que caem
+    em semanas ISO do próprio ano, como o mapa anual sempre exibiu.
+    """
+    if not data_inicio:
+        return []
+
+    segunda_semana_1 = datetime.combine(date.fromisocalendar(ano, 1, 1), time.min)
+    total_semanas = numero_semanas_iso(ano)
+    primeiro_momento = datetime(ano, 1, 1)
+    ultimo_momento = datetime.combine(date(ano, 12, 31), time.max)
+
+    def indice_semana(momento):
+        return (momento - segunda_semana_1) // UMA_SEMANA
+
+    def semanas_validas(indices):
+        return sorted({i + 1 for i in indices if 0 <= i < total_semanas})
+
+    inicio = primeira_execucao(tipo_geracao, data_inicio)
+
+    if tipo_geracao == 'data_abertura':
+        if primeiro_momento <= inicio <= ultimo_momento:
+            return semanas_validas([indice_semana(inicio)])
+        return []
+
+    passo = passo_do_plano(tipo_geracao, frequencia)
+    if passo is None:
+        return []
+
+    intervalo = indices_execucao(inicio, passo, primeiro_momento, ultimo_momento)
+    if intervalo is None:
+        return []
+    k0, k1 = intervalo
+
+    if passo <= UMA_SEMANA:
+        # Com passo de até 7 dias toda semana entre a primeira e a última execução é atingida
+        primeira = max(indice_semana(inicio + passo * k0), 0)
+        ultima = min(indice_semana(inicio + passo * k1), total_semanas - 1)
+        return list(range(primeira + 1, ultima + 2)) if primeira <= ultima else []
+
+    # Passos maiores que uma semana geram no máximo ~53 execuções por ano
+    return semanas_validas(indice_semana(inicio + passo * k) for k in range(k0, k1 + 1))
+
+def semanas_execucao_periodo(tipo_geracao, frequencia, data_inicio, ano_inicial, ano_final):
+    """Semanas de execução para cada ano do intervalo: {ano: [semanas]}"""
+    return {
+        ano: semanas_execucao(tipo_geracao, frequencia, data_inicio, ano)
+        for ano in range(ano_inicial, ano_final + 1)
+    }
@@ -0,0 +1,226 @@
+import random
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+
+from dashboard import invalidar_resumo_dashboard, resumo_mensal_ativo, reconstruir_resumo_mensal
+from hierarquia import caminho_empresa, rotulo_localizacao, invalidar_cache_hierarquia
+from models import (db, User, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, Componente,
+                    PlanoInspecao, ItemInspecao, OrdemExecucao, ItemInspecaoApontado)
+
+# ==============================================================================
+# Planta sintética para benchmarks (volumes proporcionais ao número de ordens)
+# ==============================================================================
+ESCALAS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+TAMANHO_LOTE = 5000
+ORDENS_POR_PLANO = 40       # ~9 meses de ordens semanais por equipamento
+FILHOS_POR_NO = 4           # setores por empresa, áreas por setor, ...
+ITENS_POR_PLANO = 5
+EXECUTANTES = 20
+SENHA_SINTETICA = 'plancheck'
+USUARIO_ADMIN = 'sintetico_admin'
+PREFIXO_EXECUTANTE = 'sintetico_exec_'
+TIPOS_ITEM = ('visual', 'sensitiva', 'medicoes')
+
+def _proximos_ids(modelo, quantidade):
+    """Ids explícitos a partir do maior id atual (INSERT em lote sem RETURNING)"""
+    inicio = (db.session.scalar(db.select(func.max(modelo.id))) or 0) + 1
+    return range(inicio, inicio + quantidade)
+
+def _inserir(modelo, linhas):
+    """Insere um iterável de dicts em lotes de TAMANHO_LOTE; retorna a quantidade"""
+    total = 0
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) == TAMANHO_LOTE:
+            db.session.execute(insert(modelo), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(modelo), lote)
+        total += len(lote)
+    return total
+
+def _ajustar_sequencias(modelos):
+    """PostgreSQL: avança as sequências dos ids após os INSERTs com id explícito"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for modelo in modelos:
+        tabela = modelo.__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('\"{tabela}\"', 'id'), (SELECT MAX(id) FROM \"{tabela}\"))"
+        ))
+
+def _usuarios():
+    """Admin e executantes sintéticos (criados uma vez; a senha é a mesma para todos)"""
+    nomes = [USUARIO_ADMIN] + [f'{PREFIXO_EXECUTANTE}{n}' for n in range(1, EXECUTANTES + 1)]
+    existentes = set(db.session.scalars(db.select(User.username).where(User.username.in_(nomes))))
+    faltando = [nome for nome in nomes if nome not in existentes]
+    if faltando:
+        modelo = User(username='-')
+        modelo.set_password(SENHA_SINTETICA)
+        db.session.execute(insert(User), [{
+            'username': nome, 'nome': nome.replace('_', ' ').title(), 'password_hash': modelo.password_hash,
+            'perfil_acesso': 'administrador' if nome == USUARIO_ADMIN else 'executante',
+            'funcao': 'executante',
+        } for nome in faltando])
+    return list(db.session.scalars(
+        db.select(User.id).where(User.username.startswith(PREFIXO_EXECUTANTE)).order_by(User.id)
+    ))
+
+def _hierarquia(equipamentos):
+    """Quantidade de nós por nível, de baixo para cima, para o número de equipamentos"""
+    quantidades = [equipamentos]
+    for _ in ('subconjunto', 'conjunto', 'area', 'setor', 'empresa'):
+        quantidades.append(max(1, -(-quantidades[-1] // FILHOS_POR_NO)))
+    return list(reversed(quantidades))  # empresa, setor, area, conjunto, subconjunto, equipamento
+
+def gerar_planta(ordens, semente=42, hoje=None):
+    """Gera a planta sintética com ~`ordens` ordens (reprodutível pela semente).
+
+    Cada equipamento tem um componente e um plano semanal com ITENS_POR_PLANO itens;
+    as ordens passadas ficam quase todas concluídas, com apontamento de cada item,
+    e ~5% das ordens são não programadas. Retorna {tabela: linhas inseridas}.
+    """
+    aleatorio = random.Random(semente)
+    hoje = hoje or datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    executantes = _usuarios()
+
+    nao_programadas = ordens // 20
+    planos = max(1, (ordens - nao_programadas) // ORDENS_POR_PLANO)
+    n_empresas, n_setores, n_areas, n_conjuntos, n_subconjuntos, n_equipamentos = _hierarquia(planos)
+    inseridos = {}
+
+    # Hierarquia: ids e caminhos calculados aqui (nenhum SELECT por nó)
+    pais = None
+    for modelo, quantidade, fk in [
+        (Empresa, n_empresas, None), (Setor, n_setores, 'empresa_id'), (Area, n_areas, 'setor_id'),
+        (Conjunto, n_conjuntos, 'area_id'), (Subconjunto, n_subconjuntos, 'conjunto_id'),
+    ]:
+        nos = []
+        for indice, id_ in enumerate(_proximos_ids(modelo, quantidade)):
+            pai = pais[indice * len(pais) // quantidade] if pais else None
+            nome = f'{modelo.__name__} {indice + 1}'
+            caminho = caminho_empresa(id_) if pai is None else f"{pai['caminho']}{id_}/"
+            nos.append({'id': id_, 'nome': nome, 'caminho': caminho, 'pai': pai, 'fk': fk})
+        inseridos[modelo.__tablename__] = _inserir(modelo, (
+            {'id': no['id'], 'nome': no['nome'], **({no['fk']: no['pai']['id'], 'caminho': no['caminho']} if no['fk'] else {})}
+            for no in nos
+        ))
+        pais = nos
+    subconjuntos = pais
+
+    equipamentos = []
+    for indice, id_ in enumerate(_proximos_ids(Equipamento, n_equipamentos)):
+        subconjunto = subconjuntos[indice * len(subconjuntos) // n_equipamentos]
+        area = subconjunto['pai']['pai']
+        setor, empresa = area['pai'], area['pai']['pai']
+        equipamentos.append({
+            'id': id_, 'nome': f'Equipamento {indice + 1}', 'codigo': f'EQ-{id_:07d}',
+            'subconjunto_id': subconjunto['id'], 'caminho': f"{subconjunto['caminho']}{id_}/",
+            'empresa_id': empresa['id'], 'setor_id': setor['id'], 'area_id': area['id'],
+            'localizacao': rotulo_localizacao(empresa['nome'], setor['nome'], area['nome']),
+            'criticidade': aleatorio.choice('ABC'), 'valor_aquisicao': round(aleatorio.uniform(5e3, 5e5), 2),
+        })
+    inseridos['equipamento'] = _inserir(Equipamento, equipamentos)
+    inseridos['componente'] = _inserir(Componente, (
+        {'id': id_, 'nome': f"Componente de {eq['nome']}", 'tag': f"TG-{id_:07d}",
+         'vida_util_estimada': aleatorio.choice((2.0, 5.0, 10.0)), 'equipamento_id': eq['id'],
+         'caminho': f"{eq['caminho']}{id_}/"}
+        for eq, id_ in zip(equipamentos, _proximos_ids(Componente, n_equipamentos))
+    ))
+
+    # Planos semanais com itens; a primeira ordem fica ~ORDENS_POR_PLANO semanas no passado
+    inicio_planos = hoje - timedelta(weeks=ORDENS_POR_PLANO - 4)
+    ids_planos = list(_proximos_ids(PlanoInspecao, n_equipamentos))
+    inseridos['plano_inspecao'] = _inserir(PlanoInspecao, (
+        {'id': id_, 'titulo': f"Inspeção semanal - {eq['nome']}", 'equipamento_id': eq['id'],
+         'tipo_geracao': 'diario', 'frequencia': 7, 'data_inicio': inicio_planos, 'data_criacao': inicio_planos}
+        for eq, id_ in zip(equipamentos, ids_planos)
+    ))
+    itens_por_plano = {}
+    itens = []
+    for id_ in _proximos_ids(ItemInspecao, n_equipamentos * ITENS_POR_PLANO):
+        plano_id = ids_planos[len(itens) // ITENS_POR_PLANO]
+        tipo = TIPOS_ITEM[len(itens) % len(TIPOS_ITEM)]
+        itens.append({'id': id_, 'plano_id': plano_id, 'tipo': tipo, 'descricao': f'Verificar ponto {len(itens) % ITENS_POR_PLANO + 1}',
+                      'valor_min': 10.0 if tipo == 'medicoes' else None, 'valor_max': 90.0 if tipo == 'medicoes' else None})
+        itens_por_plano.setdefault(plano_id, []).append(id_)
+    inseridos['item_inspecao'] = _inserir(ItemInspecao, itens)
+    del itens
+
+    # Ordens programadas e apontamentos gravados a cada TAMANHO_LOTE ordens (sem manter tudo em memória)
+    inseridos['ordem_execucao'] = inseridos['item_inspecao_apontado'] = 0
+    ordens_lote, apontamentos = [], []
+
+    def gravar_lote():
+        inseridos['ordem_execucao'] += _inserir(OrdemExecucao, ordens_lote)
+        inseridos['item_inspecao_apontado'] += _inserir(ItemInspecaoApontado, apontamentos)  # após as ordens (FK)
+        ordens_lote.clear()
+        apontamentos.clear()
+
+    ids_ordens = iter(_proximos_ids(OrdemExecucao, len(ids_planos) * ORDENS_POR_PLANO))
+    proximo_apontamento = _proximos_ids(ItemInspecaoApontado, 1).start
+    for plano_id in ids_planos:
+        executante_id = executantes[plano_id % len(executantes)]
+        for semana in range(ORDENS_POR_PLANO):
+            data = inicio_planos + timedelta(weeks=semana)
+            passada = data < hoje
+            status = 'concluida' if passada and aleatorio.random() < 0.85 else (
+                'em_andamento' if passada and aleatorio.random() < 0.5 else 'pendente')
+            ordem = {'id': next(ids_ordens), 'tipo_ordem': 'programada', 'plano_id': plano_id,
+                     'executante_id': executante_id, 'data_programada': data, 'status': status,
+                     'tempo_previsto': 1.0, 'data_hora_inicio': None, 'data_hora_fim': None, 'data_conclusao': None}
+            if status == 'concluida':
+                ordem.update(data_hora_inicio=data, data_hora_fim=data + timedelta(hours=1),
+                             data_conclusao=data + timedelta(hours=1))
+                for item_id in itens_por_plano[plano_id]:
+                    conforme = aleatorio.random() < 0.9
+                    apontamentos.append({
+                        'id': proximo_apontamento, 'ordem_id': ordem['id'], 'item_inspecao_id': item_id,
+                        'resultado': 'conforme' if conforme else 'nao_conforme',
+                        'valor_atual': round(aleatorio.uniform(5, 95), 1),
+                        'falha': None if conforme else 'Desgaste acima do normal',
+                    })
+                    proximo_apontamento += 1
+            ordens_lote.append(ordem)
+            if len(ordens_lote) == TAMANHO_LOTE:
+                gravar_lote()
+    gravar_lote()
+
+    inseridos['ordem_execucao'] += _inserir(OrdemExecucao, (
+        {'id': id_, 'tipo_ordem': 'nao_programada', 'plano_id': None,
+         'executante_id': aleatorio.choice(executantes), 'setor_id': eq['setor_id'], 'area_id': eq['area_id'],
+         'equipamento_id': eq['id'], 'data_programada': hoje - timedelta(days=aleatorio.randint(0, 270)),
+         'status': aleatorio.choice(('pendente', 'em_andamento', 'concluida')),
+         'servico_solicitado': 'Correção de falha apontada na inspeção', 'tempo_previsto': 2.0}
+        for eq, id_ in zip((aleatorio.choice(equipamentos) for _ in range(nao_programadas)),
+                           _proximos_ids(OrdemExecucao, nao_programadas))
+    ))
+
+    _ajustar_sequencias([User, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, Componente,
+                         PlanoInspecao, ItemInspecao, OrdemExecucao, ItemInspecaoApontado])
+    invalidar_cache_hierarquia()
+    invalidar_resumo_dashboard()
+    db.session.commit()
+    if resumo_mensal_ativo():
+        reconstruir_resumo_mensal()
+    return inseridos
+
+@click.command('gerar-dados-sinteticos')
+@click.option('--escala', type=click.Choice(list(ESCALAS)), default='10k', show_default=True,
+              help='Número aproximado de ordens')
+@click.option('--ordens', type=int, help='Número de ordens (substitui --escala)')
+@click.option('--semente', type=int, default=42, show_default=True)
+@with_appcontext
+def gerar_dados_sinteticos_command(escala, ordens, semente):
+    """Gera uma planta sintética para benchmarks (usar em banco dedicado)"""
+    inicio = datetime.now()
+    inseridos = gerar_planta(ordens or ESCALAS[escala], semente=semente)
+    for tabela, quantidade in inseridos.items():
+        click.echo(f'{tabela:>24}: {quantidade}')
+    click.echo(f'Concluído em {(datetime.now() - inicio).total_seconds():.1f}s. '
+               f'Login: {USUARIO_ADMIN} / {SENHA_SINTETICA} (executantes: {PREFIXO_EXECUTANTE}1..{EXECUTANTES})')
@@ -0,0 +1,289 @@
+from collections import defaultdict
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, case, literal_column
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from cache import CacheTTL
+from models import db, Equipamento, PlanoInspecao, OrdemExecucao, OrdemResumoMensal
+from replica import lendo_da_replica
+
+# Cache das respostas do dashboard; invalidado a cada flush que altera ordens
+cache_dashboard = CacheTTL(ttl=30, max_entradas=16)
+
+_CHAVES_STATUS = {'pendente': 'pendentes', 'em_andamento': 'em_andamento', 'concluida': 'concluidas'}
+
+# ==============================================================================
+# Agregação mensal de ordens (programadas x realizadas)
+# ==============================================================================
+def resumo_mensal_ativo():
+    """Indica se a tabela de resumo mensal está habilitada (Config.DASHBOARD_RESUMO_MENSAL)"""
+    return current_app.config.get('DASHBOARD_RESUMO_MENSAL', False)
+
+def _dialeto():
+    return db.engine.dialect.name
+
+def _expr_mes(coluna):
+    """Expressão SQL que trunca uma data para o primeiro dia do mês"""
+    # literal_column evita parâmetros distintos no SELECT e no GROUP BY
+    if _dialeto() == 'postgresql':
+        return db.cast(func.date_trunc(literal_column("'month'"), coluna), db.Date)
+    return func.date(coluna, literal_column("'start of month'"))  # SQLite
+
+def _para_mes(valor):
+    """Normaliza o valor retornado pelo banco (date, datetime ou texto) para date"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+def serie_mensal(limite=6):
+    """Retorna os últimos `limite` meses com ordens programadas, realizadas e % de cumprimento"""
+    if resumo_mensal_ativo():
+        resumo = OrdemResumoMensal
+        programadas = func.sum(resumo.total)
+        linhas = db.session.query(
+            resumo.mes,
+            programadas,
+            func.sum(case((resumo.status == 'concluida', resumo.total), else_=0))
+        ).group_by(resumo.mes).having(programadas > 0).order_by(resumo.mes.desc()).limit(limite).all()
+    else:
+        mes = _expr_mes(OrdemExecucao.data_programada)
+        linhas = db.session.query(
+            mes,
+            func.count(OrdemExecucao.id),
+            func.sum(case((OrdemExecucao.status == 'concluida', 1), else_=0))
+        ).group_by(mes).order_by(mes.desc()).limit(limite).all()
+
+    linhas = sorted((_para_mes(m), int(p or 0), int(r or 0)) for m, p, r in linhas)
+
+    return {
+        'meses': [m.strftime('%m/%Y') for m, _, _ in linhas],
+        'programadas': [p for _, p, _ in linhas],
+        'realizadas': [r for _, _, r in linhas],
+        'percentual': [round((r / p * 100), 1) if p > 0 else 0 for _, p, r in linhas]
+    }
+
+# ==============================================================================
+# Contadores e resumo consolidado
+# ==============================================================================
+def contagem_ordens():
+    """Contadores por status e tipo de ordem a partir de um único GROUP BY tipo_ordem, status"""
+    if resumo_mensal_ativo():
+        resumo = OrdemResumoMensal
+        linhas = db.session.query(
+            resumo.tipo_ordem, resumo.status, func.sum(resumo.total)
+        ).group_by(resumo.tipo_ordem, resumo.status).all()
+    else:
+        linhas = db.session.query(
+            OrdemExecucao.tipo_ordem, OrdemExecucao.status, func.count(OrdemExecucao.id)
+        ).group_by(OrdemExecucao.tipo_ordem, OrdemExecucao.status).all()
+
+    ordens = {'total': 0, 'pendentes': 0, 'em_andamento': 0, 'concluidas': 0}
+    tipo_ordem = {'programadas': 0, 'nao_programadas': 0}
+    nao_programadas = {'pendentes': 0, 'em_andamento': 0, 'concluidas': 0}
+
+    for tipo, status, total in linhas:
+        total = int(total or 0)
+        chave_status = _CHAVES_STATUS.get(status or 'pendente')
+        ordens['total'] += total
+        if chave_status:
+            ordens[chave_status] += total
+        if tipo == 'nao_programada':
+            tipo_ordem['nao_programadas'] += total
+            if chave_status:
+                nao_programadas[chave_status] += total
+        else:
+            tipo_ordem['programadas'] += total
+
+    return {'ordens': ordens, 'tipo_ordem': tipo_ordem, 'nao_programadas': nao_programadas}
+
+def estatisticas_equipamentos():
+    """Ordens programadas x realizadas por equipamento (agregação no banco)"""
+    equipamentos_data_agregada = db.session.query(
+        Equipamento.nome,
+        Equipamento.codigo,
+        func.count(OrdemExecucao.id).label('total_programadas'),
+        func.sum(case((OrdemExecucao.status == 'concluida', 1), else_=0)).label('total_realizadas')
+    ).select_from(Equipamento).outerjoin(PlanoInspecao).outerjoin(OrdemExecucao).group_by(
+        Equipamento.id, Equipamento.nome, Equipamento.codigo
+    ).all()
+
+    equipamentos_stats = []
+    for nome, codigo, total_programadas, total_realizadas in equipamentos_data_agregada:
+        total_realizadas = total_realizadas or 0
+        percentual = round((total_realizadas / total_programadas * 100), 1) if total_programadas > 0 else 0
+
+        equipamentos_stats.append({
+            'equipamento': nome,
+            'codigo': codigo or '-',
+            'programadas': total_programadas,
+            'realizadas': total_realizadas,
+            'percentual': percentual
+        })
+
+    equipamentos_stats.sort(key=lambda x: x['percentual'], reverse=True)
+    return equipamentos_stats
+
+def _calcular_resumo():
+    resumo = contagem_ordens()
+    resumo['equipamentos'] = estatisticas_equipamentos()
+    resumo['mensal'] = serie_mensal(limite=6)
+    return resumo
+
+def _em_cache(chave, calcular):
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+    if not ttl:
+        return calcular()
+    if lendo_da_replica():
+        # A réplica pode estar atrasada: gravar o resultado no cache o serviria por todo o TTL,
+        # inclusive a quem acabou de gravar e depois de uma invalidação. Só o primário preenche
+        valor = cache_dashboard.obter(chave)
+        return valor if valor is not None else calcular()
+    return cache_dashboard.obter_ou_calcular(chave, calcular, ttl=ttl)
+
+def resumo_dashboard():
+    """Resumo completo do dashboard, em cache por DASHBOARD_CACHE_TTL segundos"""
+    return _em_cache('resumo', _calcular_resumo)
+
+def contagem_ordens_cache():
+    """Contadores do resumo em cache (usado pelas APIs individuais do dashboard)"""
+    return _em_cache('contagem', contagem_ordens)
+
+# ==============================================================================
+# Manutenção incremental do resumo mensal
+# ==============================================================================
+def _chave(mes_ref, tipo_ordem, status):
+    return (
+        date(mes_ref.year, mes_ref.month, 1),
+        tipo_ordem or 'programada',
+        status or 'pendente'
+    )
+
+def _valor_anterior(ordem, atributo):
+    historico = get_history(ordem, atributo)
+    if historico.deleted:
+        return historico.deleted[0]
+    return getattr(ordem, atributo)
+
+def _chave_atual(ordem):
+    return _chave(ordem.data_programada, ordem.tipo_ordem, ordem.status)
+
+def _chave_anterior(ordem):
+    return _chave(
+        _valor_anterior(ordem, 'data_programada'),
+        _valor_anterior(ordem, 'tipo_ordem'),
+        _valor_anterior(ordem, 'status')
+    )
+
+def _insert(conexao):
+    if conexao.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def _aplicar_deltas(conexao, deltas):
+    tabela = OrdemResumoMensal.__table__
+    insert = _insert(conexao)
+    for (mes, tipo_ordem, status), delta in deltas.items():
+        if not delta:
+            continue
+        stmt = insert(tabela).values(mes=mes, tipo_ordem=tipo_ordem, status=status, total=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.mes, tabela.c.tipo_ordem, tabela.c.status],
+            set_={'total': tabela.c.total + stmt.excluded.total}
+        )
+        conexao.execute(stmt)
+
+@event.listens_for(Session, 'after_flush')
+def _atualizar_resumo_mensal(session, flush_context):
+    """Aplica ao resumo as ordens criadas, alteradas (status/tipo/data) e excluídas no flush"""
+    if any(isinstance(obj, (OrdemExecucao, PlanoInspecao, Equipamento)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['invalidar_cache_dashboard'] = True
+
+    if not resumo_mensal_ativo():
+        return
+
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, OrdemExecucao):
+            deltas[_chave_atual(obj)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, OrdemExecucao) and session.is_modified(obj, include_collections=False):
+            anterior, atual = _chave_anterior(obj), _chave_atual(obj)
+            if anterior != atual:
+                deltas[anterior] -= 1
+                deltas[atual] += 1
+    for obj in session.deleted:
+        if isinstance(obj, OrdemExecucao):
+            deltas[_chave_anterior(obj)] -= 1
+
+    if deltas:
+        _aplicar_deltas(session.connection(), deltas)
+
+def registrar_ordens_inseridas(ordens):
+    """Atualiza resumo e cache para ordens inseridas em lote via Core (sem flush do ORM)"""
+    db.session.info['invalidar_cache_dashboard'] = True
+    if not resumo_mensal_ativo():
+        return
+    deltas = defaultdict(int)
+    for ordem in ordens:
+        deltas[_chave(ordem['data_programada'], ordem.get('tipo_ordem'), ordem.get('status'))] += 1
+    _aplicar_deltas(db.session.connection(), deltas)
+
+def descontar_ordens_excluidas(ids_ordens):
+    """Retira do resumo as ordens que o banco vai excluir em cascata (sem passar pelo ORM)"""
+    db.session.info['invalidar_cache_dashboard'] = True
+    if not resumo_mensal_ativo():
+        return
+    mes = _expr_mes(OrdemExecucao.data_programada)
+    linhas = db.session.execute(
+        db.select(mes, OrdemExecucao.tipo_ordem, OrdemExecucao.status, func.count(OrdemExecucao.id))
+        .where(OrdemExecucao.id.in_(ids_ordens))
+        .group_by(mes, OrdemExecucao.tipo_ordem, OrdemExecucao.status)
+    )
+    deltas = defaultdict(int)
+    for mes_ref, tipo_ordem, status, total in linhas:
+        deltas[_chave(_para_mes(mes_ref), tipo_ordem, status)] -= total
+    _aplicar_deltas(db.session.connection(), deltas)
+
+def invalidar_resumo_dashboard():
+    """Marca o cache do dashboard para descarte no próximo commit (alterações fora do ORM)"""
+    db.session.info['invalidar_cache_dashboard'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_cache_dashboard(session):
+    """Descarta o cache do dashboard somente após o commit, para não recachear dados antigos"""
+    if session.info.pop('invalidar_cache_dashboard', False):
+        cache_dashboard.invalidar()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_invalidacao(session, transacao_anterior):
+    session.info.pop('invalidar_cache_dashboard', None)
+
+def reconstruir_resumo_mensal():
+    """Recalcula todo o resumo mensal a partir de ordem_execucao (GROUP BY no banco)"""
+    tabela = OrdemResumoMensal.__table__
+    mes = _expr_mes(OrdemExecucao.data_programada)
+    tipo_ordem = func.coalesce(OrdemExecucao.tipo_ordem, literal_column("'programada'"))
+    status = func.coalesce(OrdemExecucao.status, literal_column("'pendente'"))
+    selecao = db.select(mes, tipo_ordem, status, func.count(OrdemExecucao.id)).group_by(mes, tipo_ordem, status)
+
+    db.session.execute(tabela.delete())
+    db.session.execute(tabela.insert().from_select(['mes', 'tipo_ordem', 'status', 'total'], selecao))
+    db.session.commit()
+    cache_dashboard.invalidar()
+    return db.session.query(func.count()).select_from(tabela).scalar()
+
+@click.command('reconstruir-resumo-mensal')
+@with_appcontext
+def reconstruir_resumo_mensal_command():
+    """Recalcula a tabela ordem_resumo_mensal (usar ao habilitar DASHBOARD_RESUMO_MENSAL)"""
+    linhas = reconstruir_resumo_mensal()
+    click.echo(f'Resumo mensal reconstruído: {linhas} linhas.')
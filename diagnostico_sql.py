@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ==============================================================================
+# Instrumentação de SQL por requisição (contagem, tempo e consultas repetidas)
+# ==============================================================================
+# Listas de parâmetros expandidas (IN (?, ?, ?)) e espaços não distinguem padrões
+_LISTA_PARAMETROS = re.compile(r'\((\s*(\?|%\(\w+\)s|:\w+)\s*,?)+\)')
+_ESPACOS = re.compile(r'\s+')
+
+class _Estatisticas:
+    """Resumo por rota e últimas requisições (em memória, por processo)"""
+
+    def __init__(self, max_recentes=200):
+        self._lock = threading.Lock()
+        self.rotas = {}
+        self.recentes = deque(maxlen=max_recentes)
+
+    def registrar(self, medicao):
+        with self._lock:
+            rota = self.rotas.setdefault(medicao['rota'], {
+                'rota': medicao['rota'], 'requisicoes': 0, 'consultas': 0, 'tempo_ms': 0.0,
+                'max_consultas': 0, 'alertas': 0,
+            })
+            rota['requisicoes'] += 1
+            rota['consultas'] += medicao['consultas']
+            rota['tempo_ms'] += medicao['tempo_ms']
+            rota['max_consultas'] = max(rota['max_consultas'], medicao['consultas'])
+            rota['alertas'] += bool(medicao['alerta'])
+            self.recentes.appendleft(medicao)
+
+    def resumo(self):
+        with self._lock:
+            rotas = [dict(r, media_consultas=r['consultas'] / r['requisicoes'],
+                          media_tempo_ms=r['tempo_ms'] / r['requisicoes']) for r in self.rotas.values()]
+            recentes = list(self.recentes)
+        rotas.sort(key=lambda r: (r['max_consultas'], r['media_tempo_ms']), reverse=True)
+        return rotas, recentes
+
+    def limpar(self):
+        with self._lock:
+            self.rotas.clear()
+            self.recentes.clear()
+
+estatisticas_sql = _Estatisticas()
+
+def padrao_sql(instrucao):
+    """Texto da instrução sem variações de espaço e de tamanho das listas IN"""
+    return _LISTA_PARAMETROS.sub('(?)', _ESPACOS.sub(' ', instrucao).strip())
+
+def _medicao_atual():
+    return g.get('diagnostico_sql') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_da_consulta(conexao, cursor, instrucao, parametros, contexto, executemany):
+    if _medicao_atual() is not None:
+        conexao.info.setdefault('diagnostico_inicio', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _depois_da_consulta(conexao, cursor, instrucao, parametros, contexto, executemany):
+    medicao = _medicao_atual()
+    inicios = conexao.info.get('diagnostico_inicio')
+    if medicao is None or not inicios:
+        return
+    medicao['tempo'] += time.perf_counter() - inicios.pop()
+    medicao['consultas'] += 1
+    medicao['padroes'][padrao_sql(instrucao)] += 1
+
+def _iniciar_medicao():
+    g.diagnostico_sql = {'consultas': 0, 'tempo': 0.0, 'padroes': Counter(), 'inicio': time.perf_counter()}
+
+def _finalizar_medicao(resposta):
+    medicao = g.pop('diagnostico_sql', None)
+    if medicao is None or request.endpoint == 'static':
+        return resposta
+    if resposta.is_streamed and not resposta.direct_passthrough:
+        # Respostas em streaming (exportações) consultam o banco enquanto o corpo é enviado,
+        # depois deste ponto: a medição mostraria só as consultas de antes do envio
+        return resposta
+
+    config = current_app.config
+    tempo_ms = medicao['tempo'] * 1000
+    total_ms = (time.perf_counter() - medicao['inicio']) * 1000
+    # Mesma instrução repetida várias vezes na requisição: indício de N+1
+    repetidas = [(padrao, vezes) for padrao, vezes in medicao['padroes'].most_common(5)
+                 if vezes >= config.get('DIAGNOSTICO_SQL_REPETICOES', 5)]
+    limite = config.get('DIAGNOSTICO_SQL_LIMITE_CONSULTAS', 20)
+    alerta = medicao['consultas'] > limite or bool(repetidas)
+
+    # Tempos e volume de consultas só para administradores (não expor a usuários nem ao /login)
+    if current_user.is_authenticated and current_user.is_admin():
+        resposta.headers.add(
+            'Server-Timing', f'db;dur={tempo_ms:.1f};desc="{medicao["consultas"]} consulta(s)"'
+        )
+        resposta.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+
+    rota = request.endpoint or request.path
+    if alerta:
+        current_app.logger.warning(
+            'SQL: %s %s executou %d consultas em %.1f ms (limite %d)%s', request.method, request.path,
+            medicao['consultas'], tempo_ms, limite,
+            ''.join(f'\n  {vezes}x {padrao[:200]}' for padrao, vezes in repetidas)
+        )
+    estatisticas_sql.registrar({
+        'rota': rota, 'metodo': request.method, 'caminho': request.full_path.rstrip('?'),
+        'status': resposta.status_code, 'consultas': medicao['consultas'], 'tempo_ms': tempo_ms,
+        'total_ms': total_ms, 'repetidas': repetidas, 'alerta': alerta, 'quando': datetime.now(),
+    })
+    return resposta
+
+def instalar_diagnostico_sql(app):
+    """Mede as consultas de cada requisição (Config.DIAGNOSTICO_SQL)"""
+    if not app.config.get('DIAGNOSTICO_SQL', False):
+        return
+    app.before_request(_iniciar_medicao)
+    app.after_request(_finalizar_medicao)
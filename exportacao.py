@@ -0,0 +1,124 @@
+import csv
+import io
+import tempfile
+
+from flask import Response, stream_with_context
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+from models import db, User, Equipamento, PlanoInspecao, ItemInspecao, OrdemExecucao, ItemInspecaoApontado
+from paginacao import filtrar_ordens
+
+# ==============================================================================
+# Exportação em massa de ordens e apontamentos (memória constante)
+# ==============================================================================
+LINHAS_POR_LOTE = 1000      # yield_per: linhas trazidas do banco por vez
+BYTES_POR_BLOCO = 64 * 1024  # Tamanho dos blocos enviados ao cliente
+
+COLUNAS_EXPORTACAO = [
+    'Ordem', 'Tipo', 'Status', 'Data Programada', 'Início', 'Fim', 'Conclusão',
+    'Plano', 'Equipamento', 'Código', 'Executante', 'Serviço Solicitado', 'Serviço Executado',
+    'Diagnóstico', 'Item', 'Tipo do Item', 'Resultado', 'Observação', 'Valor Atual',
+    'Falha', 'Solução', 'Tempo (h)', 'Qtd Executantes', 'Materiais'
+]
+
+def consulta_exportacao(filtros):
+    """Uma linha por apontamento (ou uma por ordem sem apontamentos), já com os nomes resolvidos"""
+    equipamento_plano = aliased(Equipamento)
+    equipamento_direto = aliased(Equipamento)
+
+    consulta = db.select(
+        OrdemExecucao.id, OrdemExecucao.tipo_ordem, OrdemExecucao.status, OrdemExecucao.data_programada,
+        OrdemExecucao.data_hora_inicio, OrdemExecucao.data_hora_fim, OrdemExecucao.data_conclusao,
+        PlanoInspecao.titulo,
+        func.coalesce(equipamento_plano.nome, equipamento_direto.nome),
+        func.coalesce(equipamento_plano.codigo, equipamento_direto.codigo),
+        func.coalesce(User.nome, User.username),
+        OrdemExecucao.servico_solicitado, OrdemExecucao.servico_executado, OrdemExecucao.diagnostico_falha,
+        ItemInspecao.descricao, ItemInspecao.tipo,
+        ItemInspecaoApontado.resultado, ItemInspecaoApontado.observacao, ItemInspecaoApontado.valor_atual,
+        ItemInspecaoApontado.falha, ItemInspecaoApontado.solucao, ItemInspecaoApontado.tempo_necessario,
+        ItemInspecaoApontado.qtde_executantes, ItemInspecaoApontado.materiais
+    ).select_from(OrdemExecucao) \
+        .outerjoin(PlanoInspecao, OrdemExecucao.plano_id == PlanoInspecao.id) \
+        .outerjoin(equipamento_plano, PlanoInspecao.equipamento_id == equipamento_plano.id) \
+        .outerjoin(equipamento_direto, OrdemExecucao.equipamento_id == equipamento_direto.id) \
+        .outerjoin(User, OrdemExecucao.executante_id == User.id) \
+        .outerjoin(ItemInspecaoApontado, ItemInspecaoApontado.ordem_id == OrdemExecucao.id) \
+        .outerjoin(ItemInspecao, ItemInspecaoApontado.item_inspecao_id == ItemInspecao.id)
+
+    consulta = filtrar_ordens(consulta, filtros)
+    return consulta.order_by(OrdemExecucao.data_programada, OrdemExecucao.id, ItemInspecaoApontado.id)
+
+def linhas_exportacao(filtros):
+    """Itera as linhas em lotes de LINHAS_POR_LOTE (cursor no servidor no PostgreSQL)"""
+    resultado = db.session.execute(
+        consulta_exportacao(filtros).execution_options(yield_per=LINHAS_POR_LOTE)
+    )
+    try:
+        for linha in resultado:
+            yield tuple(linha)
+    finally:
+        resultado.close()
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    return valor
+
+def blocos_csv(linhas):
+    """CSV em blocos (separador ';' e BOM, como o Excel em português espera)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    for linha in linhas:
+        escritor.writerow([_texto(valor) for valor in linha])
+        if buffer.tell() >= BYTES_POR_BLOCO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def blocos_xlsx(linhas):
+    """XLSX montado em modo write-only (linhas vão para disco, não para a memória).
+
+    O formato zip só pode ser enviado depois de fechado, então o arquivo é
+    gravado em um temporário e transmitido em blocos.
+    """
+    from openpyxl import Workbook  # importado no uso: só a exportação xlsx precisa dele
+
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet('Ordens')
+    planilha.append(COLUNAS_EXPORTACAO)
+    for linha in linhas:
+        planilha.append(list(linha))
+
+    with tempfile.TemporaryFile() as arquivo:
+        workbook.save(arquivo)
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(BYTES_POR_BLOCO)
+            if not bloco:
+                break
+            yield bloco
+
+def exportar_ordens(filtros, formato='xlsx'):
+    """Resposta em streaming com todas as ordens filtradas e seus apontamentos"""
+    linhas = linhas_exportacao(filtros)
+    if formato == 'csv':
+        blocos, extensao = blocos_csv(linhas), 'csv'
+        mimetype = 'text/csv; charset=utf-8'
+    else:
+        blocos, extensao = blocos_xlsx(linhas), 'xlsx'
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    periodo = '_'.join(
+        filtros[chave].strftime('%Y%m%d') for chave in ('data_inicio', 'data_fim') if filtros.get(chave)
+    )
+    filename = f"ordens_{periodo}.{extensao}" if periodo else f"ordens.{extensao}"
+    response = Response(stream_with_context(blocos), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
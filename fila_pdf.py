@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from flask import current_app, jsonify, make_response, render_template, request, url_for
+
+from cache_pdf import caminho_pdf, chave_conteudo, diretorio_cache_pdf, enviar_pdf, gravar_atomico, \
+    limpar_cache_pdf, resposta_pdf_em_cache, versao_template
+from contexto_pdf import contexto_pdf
+from utils import pdf_do_html
+
+# ==============================================================================
+# Renderização de PDFs fora da requisição (pool de processos e consulta do status)
+# ==============================================================================
+# A rota monta o HTML (única parte que usa o banco), agenda a renderização e responde 202.
+# O PDF vai para o cache em disco (cache_pdf.py) e a página de espera consulta o status até
+# ele ficar pronto. Os marcadores .pendente/.erro ficam no mesmo diretório, então qualquer
+# worker do servidor responde o status de um relatório agendado por outro.
+CHAVE_VALIDA = re.compile(r'[0-9a-f]{64}')
+
+_lock = threading.Lock()
+_executor = None
+_jobs = {}  # chave -> Future (relatórios agendados por este processo)
+_contadores = {'agendados': 0, 'concluidos': 0, 'falhas': 0, 'recusados': 0}
+
+def _renderizar_em_processo(html, template, caminho):
+    # Roda no processo do pool: grava direto no cache para não devolver os bytes pelo pipe
+    gravar_atomico(caminho, pdf_do_html(html, template))
+
+def _executor_pdf():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: o worker do servidor tem threads, e fork copiaria locks em uso.
+            # O initializer cria o contexto do WeasyPrint antes do primeiro relatório
+            _executor = ProcessPoolExecutor(max_workers=current_app.config['PDF_PROCESSOS'],
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=contexto_pdf)
+        return _executor
+
+def _marcadores(chave):
+    base = os.path.join(diretorio_cache_pdf(), chave)
+    return base + '.pendente', base + '.erro'
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+def _concluir(chave, pendente, erro, futuro):
+    global _executor
+    excecao = futuro.exception()
+    with _lock:
+        _jobs.pop(chave, None)
+        _contadores['falhas' if excecao else 'concluidos'] += 1
+        if isinstance(excecao, BrokenProcessPool):
+            _executor = None  # um processo morreu: o próximo agendamento cria outro pool
+    try:
+        if excecao:
+            gravar_atomico(erro, f'{type(excecao).__name__}: {excecao}'.encode('utf-8'))
+        _remover(pendente)
+    except OSError:
+        pass  # diretório do cache removido enquanto o relatório era gerado
+
+def agendar_pdf(chave, html, template=None):
+    """Agenda a renderização do HTML; False se a fila deste processo está cheia (PDF_FILA_MAX)
+    ou o pool de processos quebrou"""
+    global _executor
+    pendente, erro = _marcadores(chave)
+    executor = _executor_pdf()
+    with _lock:
+        if chave in _jobs:
+            return True
+        if len(_jobs) >= current_app.config['PDF_FILA_MAX']:
+            _contadores['recusados'] += 1
+            return False
+        try:
+            futuro = executor.submit(_renderizar_em_processo, html, template, caminho_pdf(chave))
+        except BrokenProcessPool:
+            # Um processo do pool morreu: o próximo agendamento cria outro pool
+            _executor = None
+            _contadores['recusados'] += 1
+            return False
+        # O marcador só é gravado com o relatório já na fila (senão ficaria órfão)
+        _remover(erro)
+        gravar_atomico(pendente, b'')
+        _jobs[chave] = futuro
+        _contadores['agendados'] += 1
+    futuro.add_done_callback(partial(_concluir, chave, pendente, erro))
+    limpar_cache_pdf()
+    return True
+
+def situacao_pdf(chave):
+    """('pronto' | 'pendente' | 'erro' | None, mensagem de erro)"""
+    if os.path.exists(caminho_pdf(chave)):
+        return 'pronto', None
+    pendente, erro = _marcadores(chave)
+    if os.path.exists(erro):
+        with open(erro, encoding='utf-8') as arquivo:
+            return 'erro', arquivo.read()
+    with _lock:
+        if chave in _jobs:
+            return 'pendente', None
+    try:
+        # Agendado por outro worker; um marcador antigo é de um worker que caiu
+        if time.time() - os.path.getmtime(pendente) < current_app.config['PDF_TEMPO_MAXIMO']:
+            return 'pendente', None
+    except FileNotFoundError:
+        pass
+    return None, None
+
+def estatisticas_fila_pdf():
+    """Profundidade da fila e contadores deste processo"""
+    with _lock:
+        return {
+            'fila': len(_jobs), 'limite': current_app.config['PDF_FILA_MAX'],
+            'processos': current_app.config['PDF_PROCESSOS'], **_contadores,
+        }
+
+def _urls(chave, filename):
+    return {
+        'status_url': url_for('main.status_pdf', chave=chave),
+        'download_url': url_for('main.baixar_pdf', chave=chave, nome=filename),
+    }
+
+def resposta_pdf(chave, template, filename='relatorio.pdf', **contexto):
+    """PDF do relatório: do cache se já renderizado; senão agenda a renderização e responde 202
+    (página de espera ou JSON). Sem `chave`, o relatório é identificado pelo HTML gerado.
+
+    Com PDF_ASSINCRONO desligado renderiza na própria requisição, como antes.
+    """
+    if chave:
+        resposta = enviar_pdf(chave, filename)
+        if resposta is not None:
+            return resposta
+
+    html = render_template(template, **contexto)
+    chave = chave or chave_conteudo(versao_template(template), html)
+    if not current_app.config['PDF_ASSINCRONO']:
+        return resposta_pdf_em_cache(chave, lambda: pdf_do_html(html, template), filename)
+    resposta = enviar_pdf(chave, filename)
+    if resposta is not None:
+        return resposta
+
+    if not agendar_pdf(chave, html, template):
+        resposta = jsonify({'erro': 'Fila de relatórios cheia, tente novamente em instantes.'})
+        resposta.status_code = 503
+        resposta.headers['Retry-After'] = '5'
+        return resposta
+
+    urls = _urls(chave, filename)
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        resposta = jsonify({'status': 'pendente', **urls})
+    else:
+        resposta = make_response(render_template('pdf_aguardando.html', **urls))
+    resposta.status_code = 202
+    resposta.headers['Location'] = urls['status_url']
+    resposta.headers['X-Fila-PDF'] = str(estatisticas_fila_pdf()['fila'])
+    return resposta
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+
+from cronograma import normalizar_tipo_geracao, passo_do_plano, primeira_execucao, indices_execucao
+from dashboard import registrar_ordens_inseridas
+from models import db, User, PlanoInspecao, OrdemExecucao
+
+# ==============================================================================
+# Geração em lote de ordens programadas por horizonte
+# ==============================================================================
+TAMANHO_LOTE = 1000
+MAX_ORDENS_POR_PLANO = 5000  # Proteção contra frequências muito pequenas
+
+def ultimas_ordens_por_plano():
+    """{plano_id: (data_programada, executante_id)} da ordem mais recente de cada plano, em uma consulta"""
+    posicao = func.row_number().over(
+        partition_by=OrdemExecucao.plano_id,
+        order_by=(OrdemExecucao.data_programada.desc(), OrdemExecucao.id.desc())
+    ).label('posicao')
+    recentes = db.select(
+        OrdemExecucao.plano_id, OrdemExecucao.data_programada, OrdemExecucao.executante_id, posicao
+    ).where(OrdemExecucao.plano_id.isnot(None)).subquery()
+
+    linhas = db.session.execute(
+        db.select(recentes.c.plano_id, recentes.c.data_programada, recentes.c.executante_id)
+        .where(recentes.c.posicao == 1)
+    )
+    return {plano_id: (data_programada, executante_id) for plano_id, data_programada, executante_id in linhas}
+
+def ocorrencias_pendentes(tipo_geracao, frequencia, data_inicio, ultima_data, inicio, fim):
+    """Datas programadas do plano entre `inicio` e `fim` ainda sem ordem.
+
+    Planos recorrentes seguem a grade da última ordem (ou de data_inicio);
+    ocorrências vencidas antes de `inicio` não são geradas retroativamente.
+    Planos por data de abertura recebem uma única ordem, se ainda não tiverem.
+    """
+    tipo = normalizar_tipo_geracao(tipo_geracao)
+
+    if tipo == 'data_abertura':
+        if ultima_data is None and data_inicio and data_inicio <= fim:
+            return [data_inicio]
+        return []
+
+    passo = passo_do_plano(tipo, frequencia)
+    if passo is None:
+        return []
+
+    if ultima_data is not None:
+        ancora = ultima_data + passo
+    elif data_inicio:
+        ancora = primeira_execucao(tipo, data_inicio)
+    else:
+        ancora = inicio
+
+    intervalo = indices_execucao(ancora, passo, inicio, fim)
+    if intervalo is None:
+        return []
+    k0, k1 = intervalo
+    k1 = min(k1, k0 + MAX_ORDENS_POR_PLANO - 1)
+    return [ancora + passo * k for k in range(k0, k1 + 1)]
+
+def gerar_ordens_em_lote(horizonte, executante_padrao_id=None, agora=None):
+    """Insere em lote as ordens de todos os planos com vencimento até agora + horizonte.
+
+    O executante de cada plano é o da sua última ordem; planos sem ordens
+    usam `executante_padrao_id` (ou são ignorados, se não informado).
+    """
+    agora = agora or datetime.now()
+    fim = agora + horizonte
+
+    ultimas = ultimas_ordens_por_plano()
+    planos = db.session.query(
+        PlanoInspecao.id, PlanoInspecao.tipo_geracao, PlanoInspecao.frequencia, PlanoInspecao.data_inicio
+    ).all()
+
+    novas = []
+    planos_atendidos = 0
+    planos_sem_executante = 0
+    for plano_id, tipo_geracao, frequencia, data_inicio in planos:
+        ultima_data, executante_id = ultimas.get(plano_id, (None, executante_padrao_id))
+        datas = ocorrencias_pendentes(tipo_geracao, frequencia, data_inicio, ultima_data, agora, fim)
+        if not datas:
+            continue
+        if not executante_id:
+            planos_sem_executante += 1
+            continue
+        planos_atendidos += 1
+        novas.extend({
+            'tipo_ordem': 'programada',
+            'plano_id': plano_id,
+            'executante_id': executante_id,
+            'data_programada': data_programada,
+            'status': 'pendente'
+        } for data_programada in datas)
+
+    # executemany: o SQLAlchemy agrupa as linhas em INSERT ... VALUES (...), (...) por lote
+    tabela = OrdemExecucao.__table__
+    for i in range(0, len(novas), TAMANHO_LOTE):
+        db.session.execute(insert(tabela), novas[i:i + TAMANHO_LOTE])
+    if novas:
+        registrar_ordens_inseridas(novas)
+    db.session.commit()
+
+    return {
+        'ordens': len(novas),
+        'planos': planos_atendidos,
+        'planos_sem_executante': planos_sem_executante
+    }
+
+def _buscar_executante(identificador):
+    if identificador is None:
+        return None
+    if str(identificador).isdigit():
+        return db.session.get(User, int(identificador))
+    return User.query.filter_by(username=identificador).first()
+
+@click.command('gerar-ordens')
+@click.option('--semanas', default=4, show_default=True, help='Horizonte de geração em semanas.')
+@click.option('--executante', default=None, help='Username ou id do executante para planos sem ordens anteriores.')
+@with_appcontext
+def gerar_ordens_command(semanas, executante):
+    """Gera em lote as ordens programadas de todos os planos para o horizonte informado"""
+    executante_padrao = _buscar_executante(executante)
+    if executante and not executante_padrao:
+        raise click.BadParameter(f'Executante não encontrado: {executante}', param_hint='--executante')
+
+    resultado = gerar_ordens_em_lote(
+        timedelta(weeks=semanas),
+        executante_padrao_id=executante_padrao.id if executante_padrao else None
+    )
+    click.echo(f"{resultado['ordens']} ordens geradas para {resultado['planos']} planos.")
+    if resultado['planos_sem_executante']:
+        click.echo(f"{resultado['planos_sem_executante']} planos ignorados por falta de executante (use --executante).")
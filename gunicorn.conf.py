@@ -0,0 +1,47 @@
+import os
+
+# ==============================================================================
+# Gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+# ==============================================================================
+# Conexões do PostgreSQL que o app pode abrir somando todos os workers
+# (max_connections menos a reserva para migrações, psql e monitoramento)
+DB_MAX_CONEXOES = int(os.environ.get('DB_MAX_CONEXOES', 90))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+# 2 * CPUs + 1, limitado para que cada thread de cada worker tenha uma conexão no pool
+workers = int(os.environ.get('WEB_WORKERS', 0)) or \
+    max(1, min((os.cpu_count() or 1) * 2 + 1, DB_MAX_CONEXOES // threads))
+if workers * threads > DB_MAX_CONEXOES:
+    raise RuntimeError(f'WEB_WORKERS={workers} x WEB_THREADS={threads} excede DB_MAX_CONEXOES={DB_MAX_CONEXOES}')
+
+# Pool de cada worker: uma conexão fixa por thread e o resto do orçamento como overflow.
+# Lido por config.py, então precisa estar no ambiente antes do app ser importado (preload)
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(DB_MAX_CONEXOES // workers - threads))
+
+# O app é importado uma vez no master e compartilhado com os workers (copy-on-write):
+# boot mais rápido e menos memória. Use CRIAR_TABELAS_NA_INICIALIZACAO=0 e `flask db upgrade` no deploy
+preload_app = True
+
+# PDFs e exportações grandes podem levar mais que o padrão de 30s
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Recicla workers periodicamente (memória de pandas/WeasyPrint após relatórios)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    # Conexões abertas no master (preload) não podem ser compartilhadas entre processos:
+    # cada worker descarta as herdadas e abre as próprias
+    from models import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
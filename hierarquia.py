@@ -0,0 +1,323 @@
+import hashlib
+import json
+
+import click
+from flask import current_app, request, make_response
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, literal, cast, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history, set_committed_value
+
+from cache import CacheTTL
+from dashboard import descontar_ordens_excluidas
+from models import (db, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, Componente,
+                    PlanoInspecao, OrdemExecucao)
+
+# ==============================================================================
+# Caminho materializado da hierarquia ("empresa/setor/area/.../id/")
+# ==============================================================================
+# Níveis abaixo de Empresa, do mais alto ao mais baixo: (modelo, coluna do pai, modelo pai)
+NIVEIS = [
+    (Setor, 'empresa_id', Empresa),
+    (Area, 'setor_id', Setor),
+    (Conjunto, 'area_id', Area),
+    (Subconjunto, 'conjunto_id', Conjunto),
+    (Equipamento, 'subconjunto_id', Subconjunto),
+    (Componente, 'equipamento_id', Equipamento),
+]
+PAI = {modelo: (coluna, pai) for modelo, coluna, pai in NIVEIS}
+
+def caminho_empresa(empresa_id):
+    return f'{empresa_id}/'
+
+def caminho_de(registro):
+    """Caminho do nó (Empresa não tem coluna: o caminho é apenas o id)"""
+    if isinstance(registro, Empresa):
+        return caminho_empresa(registro.id)
+    return registro.caminho
+
+def _caminho_do_pai(conexao, modelo, pai_id):
+    _, pai = PAI[modelo]
+    if pai is Empresa:
+        return caminho_empresa(pai_id)
+    return conexao.scalar(db.select(pai.caminho).where(pai.id == pai_id))
+
+def _gravar_caminho(conexao, registro, caminho):
+    tabela = type(registro).__table__
+    conexao.execute(tabela.update().where(tabela.c.id == registro.id).values(caminho=caminho))
+    set_committed_value(registro, 'caminho', caminho)
+
+def _ao_inserir(mapper, conexao, registro):
+    coluna, _ = PAI[type(registro)]
+    caminho_pai = _caminho_do_pai(conexao, type(registro), getattr(registro, coluna))
+    if caminho_pai is not None:
+        _gravar_caminho(conexao, registro, f'{caminho_pai}{registro.id}/')
+
+def _ao_atualizar(mapper, conexao, registro):
+    """Nó movido para outro pai: regrava o caminho dele e de toda a subárvore"""
+    modelo = type(registro)
+    coluna, _ = PAI[modelo]
+    if not get_history(registro, coluna).has_changes():
+        return
+    antigo = conexao.scalar(db.select(modelo.caminho).where(modelo.id == registro.id))
+    caminho_pai = _caminho_do_pai(conexao, modelo, getattr(registro, coluna))
+    if antigo is None or caminho_pai is None:
+        return
+    novo = f'{caminho_pai}{registro.id}/'
+    _gravar_caminho(conexao, registro, novo)
+
+    inicio = [m for m, _, _ in NIVEIS].index(modelo) + 1
+    for descendente, _, _ in NIVEIS[inicio:]:
+        tabela = descendente.__table__
+        conexao.execute(
+            tabela.update()
+            .where(tabela.c.caminho.startswith(antigo))
+            .values(caminho=literal(novo) + func.substr(tabela.c.caminho, len(antigo) + 1))
+        )
+    if modelo in (Setor, Area, Conjunto, Subconjunto):
+        sincronizar_localizacao(conexao, novo)
+
+for _modelo, _, _ in NIVEIS:
+    event.listen(_modelo, 'after_insert', _ao_inserir)
+    event.listen(_modelo, 'after_update', _ao_atualizar)
+
+# ==============================================================================
+# Localização desnormalizada do equipamento (empresa_id, setor_id, area_id, localizacao)
+# ==============================================================================
+def rotulo_localizacao(empresa_nome, setor_nome, area_nome):
+    return ' > '.join(nome for nome in (empresa_nome, setor_nome, area_nome) if nome)
+
+def _colunas_localizacao():
+    return (Area.id, Setor.id, Setor.empresa_id, Empresa.nome, Setor.nome, Area.nome)
+
+def _juntar_ate_empresa(consulta):
+    return consulta.join(Conjunto, Subconjunto.conjunto_id == Conjunto.id) \
+        .join(Area, Conjunto.area_id == Area.id) \
+        .join(Setor, Area.setor_id == Setor.id) \
+        .join(Empresa, Setor.empresa_id == Empresa.id)
+
+def _definir_localizacao(mapper, conexao, equipamento):
+    """Preenche a localização no próprio INSERT/UPDATE do equipamento (novo ou movido de subconjunto)"""
+    if equipamento.id is not None and not get_history(equipamento, 'subconjunto_id').has_changes():
+        return
+    linha = conexao.execute(
+        _juntar_ate_empresa(db.select(*_colunas_localizacao()).select_from(Subconjunto))
+        .where(Subconjunto.id == equipamento.subconjunto_id)
+    ).first()
+    if linha is None:
+        return
+    area_id, setor_id, empresa_id, empresa_nome, setor_nome, area_nome = linha
+    equipamento.area_id = area_id
+    equipamento.setor_id = setor_id
+    equipamento.empresa_id = empresa_id
+    equipamento.localizacao = rotulo_localizacao(empresa_nome, setor_nome, area_nome)
+
+def sincronizar_localizacao(conexao, prefixo):
+    """Recalcula a localização dos equipamentos sob o caminho `prefixo` (um SELECT e um UPDATE em lote)"""
+    linhas = conexao.execute(
+        _juntar_ate_empresa(
+            db.select(Equipamento.id, *_colunas_localizacao()).select_from(Equipamento)
+            .join(Subconjunto, Equipamento.subconjunto_id == Subconjunto.id)
+        ).where(Equipamento.caminho.startswith(prefixo))
+    ).all()
+    if not linhas:
+        return
+    tabela = Equipamento.__table__
+    conexao.execute(
+        tabela.update().where(tabela.c.id == bindparam('b_id')).values(
+            area_id=bindparam('b_area_id'),
+            setor_id=bindparam('b_setor_id'),
+            empresa_id=bindparam('b_empresa_id'),
+            localizacao=bindparam('b_localizacao'),
+        ),
+        [{
+            'b_id': equipamento_id, 'b_area_id': area_id, 'b_setor_id': setor_id, 'b_empresa_id': empresa_id,
+            'b_localizacao': rotulo_localizacao(empresa_nome, setor_nome, area_nome)
+        } for equipamento_id, area_id, setor_id, empresa_id, empresa_nome, setor_nome, area_nome in linhas]
+    )
+
+def _ao_renomear(mapper, conexao, registro):
+    """Empresa, Setor ou Área renomeados: atualiza o rótulo dos equipamentos abaixo"""
+    if get_history(registro, 'nome').has_changes() and caminho_de(registro):
+        sincronizar_localizacao(conexao, caminho_de(registro))
+
+event.listen(Equipamento, 'before_insert', _definir_localizacao)
+event.listen(Equipamento, 'before_update', _definir_localizacao)
+for _modelo in (Empresa, Setor, Area):
+    event.listen(_modelo, 'after_update', _ao_renomear)
+
+def reconstruir_caminhos():
+    """Recalcula todos os caminhos a partir das FKs, nível a nível (um UPDATE por tabela), e as localizações"""
+    for modelo, coluna, pai in NIVEIS:
+        tabela = modelo.__table__
+        id_texto = cast(tabela.c.id, db.String)
+        if pai is Empresa:
+            caminho_pai = cast(tabela.c[coluna], db.String) + '/'
+        else:
+            caminho_pai = db.select(pai.caminho).where(pai.id == tabela.c[coluna]).scalar_subquery()
+        db.session.execute(tabela.update().values(caminho=caminho_pai + id_texto + '/'))
+    sincronizar_localizacao(db.session.connection(), '')
+    db.session.commit()
+
+@click.command('reconstruir-caminhos')
+@with_appcontext
+def reconstruir_caminhos_command():
+    """Recalcula o caminho materializado e a localização dos equipamentos de toda a hierarquia"""
+    reconstruir_caminhos()
+    click.echo('Caminhos e localizações da hierarquia reconstruídos.')
+
+# ==============================================================================
+# Exclusão de nós (os dependentes são removidos pelo banco: ON DELETE CASCADE)
+# ==============================================================================
+def _ordens_excluidas(registro):
+    """Ids das ordens programadas que a exclusão do nó (ou plano) remove em cascata"""
+    consulta = db.select(OrdemExecucao.id).join(PlanoInspecao, OrdemExecucao.plano_id == PlanoInspecao.id)
+    if isinstance(registro, PlanoInspecao):
+        return consulta.where(PlanoInspecao.id == registro.id)
+    if isinstance(registro, Equipamento):
+        return consulta.where(PlanoInspecao.equipamento_id == registro.id)
+    return consulta.join(Equipamento, PlanoInspecao.equipamento_id == Equipamento.id).where(
+        Equipamento.caminho.startswith(caminho_de(registro))
+    )
+
+def excluir_no(registro):
+    """Exclui um nó da hierarquia ou um plano com um único DELETE.
+
+    Os filhos não são carregados (passive_deletes): o banco remove a subárvore,
+    planos, itens, ordens e apontamentos, e o cache do mapa anual pelas FKs. O
+    resumo mensal do dashboard, mantido a cada flush, é ajustado antes.
+    """
+    if not isinstance(registro, Componente):
+        descontar_ordens_excluidas(_ordens_excluidas(registro))
+    db.session.delete(registro)
+
+# ==============================================================================
+# Filhos de um nó (um nível por vez, com contagens) para a árvore de ver_empresa
+# ==============================================================================
+MODELOS = {'empresa': Empresa, 'setor': Setor, 'area': Area, 'conjunto': Conjunto,
+           'subconjunto': Subconjunto, 'equipamento': Equipamento, 'componente': Componente}
+TIPOS = {modelo: tipo for tipo, modelo in MODELOS.items()}
+FILHO = {pai: (modelo, coluna) for modelo, coluna, pai in NIVEIS}
+
+def _contar_por(coluna, ids):
+    """{id do pai: quantidade} agrupando pela FK"""
+    linhas = db.session.execute(
+        db.select(coluna, func.count()).where(coluna.in_(ids)).group_by(coluna)
+    )
+    return dict(linhas.all())
+
+def _contar_equipamentos(modelo, ids):
+    """{id do nó: equipamentos sob ele} para nós de Setor a Subconjunto, em uma consulta com joins pelas FKs"""
+    consulta = db.select(Equipamento.id).select_from(Equipamento)
+    chave, atual = Equipamento.subconjunto_id, Subconjunto
+    while atual is not modelo:
+        consulta = consulta.join(atual, atual.id == chave)
+        coluna, pai = PAI[atual]
+        chave, atual = getattr(atual, coluna), pai
+    consulta = consulta.with_only_columns(chave, func.count(Equipamento.id)).where(chave.in_(ids)).group_by(chave)
+    return dict(db.session.execute(consulta).all())
+
+def filhos_do_no(tipo, no_id):
+    """Filhos diretos de um nó com as contagens exibidas na árvore (número fixo de consultas).
+
+    Retorna None se o tipo não existir ou não tiver filhos (componente).
+    """
+    modelo = MODELOS.get(tipo)
+    if modelo not in FILHO:
+        return None
+    modelo_filho, coluna = FILHO[modelo]
+    filhos = modelo_filho.query.filter(getattr(modelo_filho, coluna) == no_id).order_by(modelo_filho.id).all()
+    ids = [filho.id for filho in filhos]
+    if not ids:
+        return []
+
+    total_filhos = {}
+    if modelo_filho in FILHO:
+        neto, coluna_neto = FILHO[modelo_filho]
+        total_filhos = _contar_por(getattr(neto, coluna_neto), ids)
+    total_equipamentos = {}
+    if modelo_filho in (Setor, Area, Conjunto, Subconjunto):
+        total_equipamentos = _contar_equipamentos(modelo_filho, ids)
+    total_planos = {}
+    if modelo_filho is Equipamento:
+        total_planos = _contar_por(PlanoInspecao.equipamento_id, ids)
+
+    resultado = []
+    for filho in filhos:
+        no = {'tipo': TIPOS[modelo_filho], 'id': filho.id, 'nome': filho.nome,
+              'total_filhos': total_filhos.get(filho.id, 0)}
+        if modelo_filho is Equipamento:
+            no.update(codigo=filho.codigo, total_planos=total_planos.get(filho.id, 0))
+        elif modelo_filho is Componente:
+            no.update(tag=filho.tag, vida_util_estimada=filho.vida_util_estimada)
+        else:
+            no['total_equipamentos'] = total_equipamentos.get(filho.id, 0)
+        resultado.append(no)
+    return resultado
+
+# ==============================================================================
+# APIs de cascata (setores → áreas → equipamentos) com cache e ETag
+# ==============================================================================
+# Cache por processo: a invalidação só alcança o worker que gravou, então o TTL curto
+# limita o tempo em que os demais respondem a lista antiga
+cache_hierarquia = CacheTTL(ttl=10, max_entradas=1024)
+
+def _lista(consulta):
+    return [{'id': id_, 'nome': nome} for id_, nome in db.session.execute(consulta)]
+
+def setores_da_empresa(empresa_id):
+    return _lista(db.select(Setor.id, Setor.nome).where(Setor.empresa_id == empresa_id).order_by(Setor.id))
+
+def areas_do_setor(setor_id):
+    return _lista(db.select(Area.id, Area.nome).where(Area.setor_id == setor_id).order_by(Area.id))
+
+def equipamentos_da_area(area_id):
+    """Equipamentos da área em uma consulta (join pelos conjuntos e subconjuntos)"""
+    return _lista(
+        db.select(Equipamento.id, Equipamento.nome)
+        .join(Subconjunto, Equipamento.subconjunto_id == Subconjunto.id)
+        .join(Conjunto, Subconjunto.conjunto_id == Conjunto.id)
+        .where(Conjunto.area_id == area_id)
+        .order_by(Conjunto.id, Subconjunto.id, Equipamento.id)
+    )
+
+def _serializar(calcular):
+    corpo = json.dumps(calcular(), ensure_ascii=False).encode('utf-8')
+    return corpo, hashlib.sha1(corpo).hexdigest()
+
+def resposta_cascata(chave, calcular):
+    """Resposta JSON da cache LRU (por HIERARQUIA_CACHE_TTL segundos) com ETag; 304 se o cliente já a tem"""
+    ttl = current_app.config.get('HIERARQUIA_CACHE_TTL', 10)
+    if ttl:
+        corpo, etag = cache_hierarquia.obter_ou_calcular(chave, lambda: _serializar(calcular), ttl=ttl)
+    else:
+        corpo, etag = _serializar(calcular)
+
+    if request.if_none_match.contains(etag):
+        resposta = make_response('', 304)
+    else:
+        resposta = make_response(corpo)
+        resposta.mimetype = 'application/json'
+    resposta.set_etag(etag)
+    # O navegador sempre revalida: alterações na hierarquia aparecem na próxima abertura do modal
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+def invalidar_cache_hierarquia():
+    """Marca o cache das cascatas para descarte no próximo commit (alterações fora do ORM)"""
+    db.session.info['invalidar_cache_hierarquia'] = True
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_cache_hierarquia(session, flush_context):
+    if any(isinstance(obj, (Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento))
+           for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['invalidar_cache_hierarquia'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_cache_hierarquia(session):
+    if session.info.pop('invalidar_cache_hierarquia', False):
+        cache_hierarquia.invalidar()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_invalidacao_hierarquia(session, transacao_anterior):
+    session.info.pop('invalidar_cache_hierarquia', None)
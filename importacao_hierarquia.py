@@ -0,0 +1,265 @@
+import csv
+import io
+import os
+import unicodedata
+import zipfile
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, bindparam
+
+from dashboard import invalidar_resumo_dashboard
+from hierarquia import caminho_empresa, rotulo_localizacao, invalidar_cache_hierarquia
+from models import db, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, Componente
+
+# ==============================================================================
+# Importação em lote da hierarquia (planilha XLSX ou CSV, uma linha por caminho)
+# ==============================================================================
+# Colunas da hierarquia, do nível mais alto ao mais baixo: (coluna, modelo, FK para o pai)
+NIVEIS_IMPORTACAO = [
+    ('empresa', Empresa, None),
+    ('setor', Setor, 'empresa_id'),
+    ('area', Area, 'setor_id'),
+    ('conjunto', Conjunto, 'area_id'),
+    ('subconjunto', Subconjunto, 'conjunto_id'),
+    ('equipamento', Equipamento, 'subconjunto_id'),
+    ('componente', Componente, 'equipamento_id'),
+]
+CAMPOS_EQUIPAMENTO = ('codigo', 'criticidade', 'valor_aquisicao')
+CAMPOS_COMPONENTE = ('tag', 'vida_util_estimada')
+TAMANHOS = {'nome': 120, 'codigo': 50, 'criticidade': 50, 'tag': 50}
+TAMANHO_LOTE = 1000
+
+def _normalizar_cabecalho(valor):
+    """'Vida Útil Estimada' -> 'vida_util_estimada'"""
+    texto = unicodedata.normalize('NFKD', str(valor or '')).encode('ascii', 'ignore').decode('ascii')
+    return '_'.join(texto.strip().lower().split())
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # Códigos numéricos lidos do Excel como 123.0
+    return str(valor).strip()
+
+def _chave(texto):
+    return ' '.join(texto.casefold().split())
+
+def ler_planilha(arquivo, nome_arquivo):
+    """Itera (número da linha, {coluna: texto}) sem carregar o arquivo inteiro em memória"""
+    extensao = os.path.splitext(nome_arquivo or '')[1].lower()
+    if extensao in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook  # importado no uso: só a leitura de xlsx precisa dele
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            workbook = load_workbook(arquivo, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            # Arquivo corrompido ou outro formato renomeado para .xlsx
+            raise ValueError('Arquivo .xlsx inválido ou corrompido') from e
+        try:
+            linhas = workbook.active.iter_rows(values_only=True)
+            cabecalho = [_normalizar_cabecalho(c) for c in next(linhas, ())]
+            for numero, valores in enumerate(linhas, start=2):
+                registro = {c: _texto(v) for c, v in zip(cabecalho, valores) if c}
+                if any(registro.values()):
+                    yield numero, registro
+        finally:
+            workbook.close()
+    elif extensao in ('.csv', '.txt'):
+        texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+        amostra = texto.readline()
+        delimitador = ';' if amostra.count(';') >= amostra.count(',') else ','
+        cabecalho = [_normalizar_cabecalho(c) for c in next(csv.reader([amostra], delimiter=delimitador), [])]
+        for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+            registro = {c: _texto(v) for c, v in zip(cabecalho, valores) if c}
+            if any(registro.values()):
+                yield numero, registro
+    else:
+        raise ValueError('Formato não suportado. Use .xlsx ou .csv')
+
+def _numero(valor):
+    """Número com vírgula ou ponto decimal (ValueError se inválido)"""
+    return float(valor.replace(',', '.')) if valor else None
+
+def _validar(registro):
+    """Lista de erros da linha (vazia se a linha for válida)"""
+    erros = []
+    if not registro.get('empresa'):
+        erros.append('empresa é obrigatória')
+    faltando = None
+    for coluna, _, _ in NIVEIS_IMPORTACAO:
+        if not registro.get(coluna):
+            faltando = faltando or coluna
+        elif faltando:
+            erros.append(f'{coluna} informado sem {faltando}')
+            break
+    for campo, tamanho in TAMANHOS.items():
+        colunas = [c for c, _, _ in NIVEIS_IMPORTACAO] if campo == 'nome' else [campo]
+        for coluna in colunas:
+            if len(registro.get(coluna, '')) > tamanho:
+                erros.append(f'{coluna} excede {tamanho} caracteres')
+    if not registro.get('equipamento') and any(registro.get(c) for c in CAMPOS_EQUIPAMENTO):
+        erros.append('dados de equipamento informados sem equipamento')
+    if not registro.get('componente') and any(registro.get(c) for c in CAMPOS_COMPONENTE):
+        erros.append('dados de componente informados sem componente')
+    for campo in ('valor_aquisicao', 'vida_util_estimada'):
+        try:
+            _numero(registro.get(campo))
+        except ValueError:
+            erros.append(f'{campo} inválido: "{registro[campo]}"')
+    return erros
+
+class _Indice:
+    """Nós existentes e novos por (pai, nome) — ou (pai, código/tag) — em memória"""
+
+    def __init__(self):
+        self.nos = {coluna: {} for coluna, _, _ in NIVEIS_IMPORTACAO}
+        self.novos = {coluna: [] for coluna, _, _ in NIVEIS_IMPORTACAO}
+
+    @staticmethod
+    def chaves(coluna, pai, nome, identificador=''):
+        pai_id = id(pai) if pai is not None else None
+        if identificador:
+            return [(pai_id, 'id', _chave(identificador)), (pai_id, 'nome', _chave(nome))]
+        return [(pai_id, 'nome', _chave(nome))]
+
+    def registrar(self, coluna, no, identificador=''):
+        for chave in self.chaves(coluna, no['pai'], no['nome'], identificador):
+            self.nos[coluna].setdefault(chave, no)
+
+    def buscar(self, coluna, pai, nome, identificador=''):
+        # Com código/tag, a identificação é só pelo código; sem ele, pelo nome
+        return self.nos[coluna].get(self.chaves(coluna, pai, nome, identificador)[0])
+
+    def carregar_existentes(self):
+        """Carrega (id, pai, nome, caminho) de toda a hierarquia: uma consulta por nível"""
+        por_id = {}
+        for coluna, modelo, fk in NIVEIS_IMPORTACAO:
+            colunas = [modelo.id, modelo.nome]
+            colunas.append(getattr(modelo, fk) if fk else db.literal(None))
+            colunas.append(modelo.caminho if modelo is not Empresa else db.literal(None))
+            identificador = {'equipamento': Equipamento.codigo, 'componente': Componente.tag}.get(coluna)
+            colunas.append(identificador if identificador is not None else db.literal(None))
+
+            atuais = {}
+            for id_, nome, pai_id, caminho, codigo in db.session.execute(db.select(*colunas)):
+                pai = por_id.get(pai_id) if fk else None
+                if fk and pai is None:
+                    continue
+                no = {'id': id_, 'nome': nome, 'pai': pai,
+                      'caminho': caminho if modelo is not Empresa else caminho_empresa(id_)}
+                self.registrar(coluna, no, codigo or '')
+                atuais[id_] = no
+            por_id = atuais
+
+def _resolver_linha(indice, registro):
+    """Encontra ou cria (em memória) os nós da linha, do nível mais alto ao mais baixo"""
+    pai = None
+    for coluna, _, _ in NIVEIS_IMPORTACAO:
+        nome = registro.get(coluna)
+        if not nome:
+            break
+        identificador = {'equipamento': registro.get('codigo'), 'componente': registro.get('tag')}.get(coluna, '')
+        no = indice.buscar(coluna, pai, nome, identificador)
+        if no is None:
+            no = {'id': None, 'nome': nome, 'pai': pai, 'registro': registro}
+            indice.registrar(coluna, no, identificador)
+            indice.novos[coluna].append(no)
+        pai = no
+
+def _valores(coluna, no):
+    registro = no['registro']
+    valores = {'nome': no['nome']}
+    if coluna == 'equipamento':
+        area = no['pai']['pai']['pai']
+        setor = area['pai']
+        empresa = setor['pai']
+        valores.update({
+            'codigo': registro.get('codigo') or None,
+            'criticidade': registro.get('criticidade') or 'C',
+            'valor_aquisicao': _numero(registro.get('valor_aquisicao')),
+            'area_id': area['id'],
+            'setor_id': setor['id'],
+            'empresa_id': empresa['id'],
+            'localizacao': rotulo_localizacao(empresa['nome'], setor['nome'], area['nome']),
+        })
+    elif coluna == 'componente':
+        valores.update({
+            'tag': registro.get('tag') or None,
+            'vida_util_estimada': _numero(registro.get('vida_util_estimada')),
+        })
+    return valores
+
+def _inserir_nivel(coluna, modelo, fk, nos):
+    """INSERT em lote com RETURNING dos ids e, em seguida, UPDATE em lote dos caminhos"""
+    tabela = modelo.__table__
+    for inicio in range(0, len(nos), TAMANHO_LOTE):
+        lote = nos[inicio:inicio + TAMANHO_LOTE]
+        linhas = []
+        for no in lote:
+            valores = no.pop('valores')
+            if fk:
+                valores[fk] = no['pai']['id']
+            linhas.append(valores)
+        ids = db.session.execute(
+            insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), linhas
+        ).scalars().all()
+        for no, id_ in zip(lote, ids):
+            no['id'] = id_
+            no['caminho'] = caminho_empresa(id_) if modelo is Empresa else f"{no['pai']['caminho']}{id_}/"
+
+        if modelo is not Empresa:
+            db.session.execute(
+                tabela.update().where(tabela.c.id == bindparam('b_id')).values(caminho=bindparam('b_caminho')),
+                [{'b_id': no['id'], 'b_caminho': no['caminho']} for no in lote]
+            )
+
+def importar_hierarquia(linhas):
+    """Importa as linhas (número, registro) em uma única transação.
+
+    Linhas inválidas são ignoradas e relatadas; os nós já existentes são
+    reaproveitados (por nome, ou por código/tag em equipamentos e componentes).
+    Retorna {'linhas', 'importadas', 'criados': {nível: quantidade}, 'erros': [(linha, mensagem)]}.
+    """
+    indice = _Indice()
+    indice.carregar_existentes()
+
+    erros = []
+    total = importadas = 0
+    for numero, registro in linhas:
+        total += 1
+        problemas = _validar(registro)
+        if problemas:
+            erros.append((numero, '; '.join(problemas)))
+            continue
+        _resolver_linha(indice, registro)
+        importadas += 1
+
+    criados = {}
+    for coluna, modelo, fk in NIVEIS_IMPORTACAO:
+        nos = indice.novos[coluna]
+        criados[coluna] = len(nos)
+        if not nos:
+            continue
+        for no in nos:
+            no['valores'] = _valores(coluna, no)
+        _inserir_nivel(coluna, modelo, fk, nos)
+
+    if any(criados.values()):
+        invalidar_cache_hierarquia()
+        invalidar_resumo_dashboard()
+    db.session.commit()
+    return {'linhas': total, 'importadas': importadas, 'criados': criados, 'erros': erros}
+
+@click.command('importar-hierarquia')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def importar_hierarquia_command(arquivo):
+    """Importa empresas, setores, áreas, conjuntos, subconjuntos, equipamentos e componentes de um XLSX/CSV"""
+    with open(arquivo, 'rb') as entrada:
+        resultado = importar_hierarquia(ler_planilha(entrada, arquivo))
+    criados = ', '.join(f'{quantidade} {nivel}' for nivel, quantidade in resultado['criados'].items())
+    click.echo(f"{resultado['importadas']} de {resultado['linhas']} linhas importadas ({criados}).")
+    for linha, mensagem in resultado['erros']:
+        click.echo(f'Linha {linha}: {mensagem}' if linha else mensagem, err=True)
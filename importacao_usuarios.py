@@ -0,0 +1,115 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from importacao_hierarquia import ler_planilha
+from models import db, User, metodo_hash_senha
+
+# ==============================================================================
+# Importação de usuários em lote (planilha XLSX ou CSV, um usuário por linha)
+# ==============================================================================
+# Cabeçalho normalizado da planilha -> coluna de User
+COLUNAS = {
+    'usuario': 'username',
+    'senha': 'senha',
+    'nome': 'nome',
+    'matricula': 'matricula',
+    'funcao': 'funcao',
+    'area': 'area',
+    'setor': 'setor',
+    'perfil': 'perfil_acesso',
+}
+TAMANHOS = {'username': 80, 'nome': 120, 'matricula': 50, 'funcao': 50, 'area': 100, 'setor': 100}
+PERFIS = ('administrador', 'executante')
+# Abaixo disso o custo de subir os processos supera o ganho
+MINIMO_PARA_PROCESSOS = 8
+
+def _gerar_hash(argumentos):
+    senha, metodo = argumentos
+    return generate_password_hash(senha, method=metodo)
+
+def gerar_hashes(senhas, metodo, processos=None):
+    """Hashes das senhas (na ordem), distribuídos entre processos quando a lista é grande"""
+    argumentos = [(senha, metodo) for senha in senhas]
+    if len(argumentos) < MINIMO_PARA_PROCESSOS or processos == 1:
+        return [_gerar_hash(a) for a in argumentos]
+    # spawn: chamado de uma requisição, e fork copiaria os locks das outras threads do worker
+    with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return list(executor.map(_gerar_hash, argumentos, chunksize=4))
+
+def _campos(registro):
+    usuario = {coluna: registro.get(cabecalho, '') for cabecalho, coluna in COLUNAS.items()}
+    usuario['perfil_acesso'] = usuario['perfil_acesso'].lower() or 'executante'
+    return usuario
+
+def _validar(usuario, usernames, matriculas):
+    """Lista de erros do usuário contra os já cadastrados e as linhas anteriores do arquivo"""
+    erros = []
+    if not usuario['username']:
+        erros.append('usuario é obrigatório')
+    elif usuario['username'] in usernames:
+        erros.append(f'usuario "{usuario["username"]}" já existe')
+    if not usuario['senha']:
+        erros.append('senha é obrigatória')
+    if usuario['matricula'] and usuario['matricula'] in matriculas:
+        erros.append(f'matrícula "{usuario["matricula"]}" já cadastrada')
+    if usuario['perfil_acesso'] not in PERFIS:
+        erros.append(f'perfil inválido: "{usuario["perfil_acesso"]}" (use {" ou ".join(PERFIS)})')
+    for coluna, tamanho in TAMANHOS.items():
+        if len(usuario[coluna]) > tamanho:
+            erros.append(f'{coluna} excede {tamanho} caracteres')
+    return erros
+
+def importar_usuarios(linhas):
+    """Valida as linhas (número, registro), gera os hashes em paralelo e insere tudo em um único INSERT.
+
+    Linhas inválidas são ignoradas e relatadas. Retorna {'linhas', 'importados', 'erros': [(linha, mensagem)]}.
+    """
+    usernames = set(db.session.scalars(db.select(User.username)))
+    matriculas = set(db.session.scalars(db.select(User.matricula).where(User.matricula.isnot(None))))
+
+    erros = []
+    novos = []
+    total = 0
+    for numero, registro in linhas:
+        total += 1
+        usuario = _campos(registro)
+        problemas = _validar(usuario, usernames, matriculas)
+        if problemas:
+            erros.append((numero, '; '.join(problemas)))
+            continue
+        usernames.add(usuario['username'])
+        if usuario['matricula']:
+            matriculas.add(usuario['matricula'])
+        novos.append(usuario)
+
+    if novos:
+        hashes = gerar_hashes(
+            [usuario.pop('senha') for usuario in novos], metodo_hash_senha(),
+            current_app.config.get('IMPORTACAO_USUARIOS_PROCESSOS')
+        )
+        for usuario, password_hash in zip(novos, hashes):
+            usuario['password_hash'] = password_hash
+            usuario['matricula'] = usuario['matricula'] or None
+            for coluna in ('nome', 'funcao', 'area', 'setor'):
+                usuario[coluna] = usuario[coluna] or None
+        db.session.execute(insert(User), novos)
+        db.session.commit()
+
+    return {'linhas': total, 'importados': len(novos), 'erros': erros}
+
+@click.command('importar-usuarios')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def importar_usuarios_command(arquivo):
+    """Cadastra usuários de um XLSX/CSV (Usuario, Senha, Nome, Matricula, Funcao, Area, Setor, Perfil)"""
+    with open(arquivo, 'rb') as entrada:
+        resultado = importar_usuarios(ler_planilha(entrada, arquivo))
+    click.echo(f"{resultado['importados']} de {resultado['linhas']} usuários importados.")
+    for linha, mensagem in resultado['erros']:
+        click.echo(f'Linha {linha}: {mensagem}', err=True)
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+import click
+
+# ==============================================================================
+# Tempo de inicialização do app (import por módulo, create_app e memória)
+# ==============================================================================
+# Dependências pesadas que devem ser carregadas só no primeiro uso (relatórios e planilhas)
+IMPORTS_SOB_DEMANDA = ('pandas', 'weasyprint', 'openpyxl')
+
+# Executado em um processo novo, como um worker recém-iniciado
+_SCRIPT_MEDICAO = f'''
+import json, resource, sys, time
+inicio = time.perf_counter()
+from app import create_app
+importado = time.perf_counter()
+create_app()
+fim = time.perf_counter()
+print(json.dumps({{
+    'importacao_ms': (importado - inicio) * 1000,
+    'create_app_ms': (fim - importado) * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'carregados': [m for m in {IMPORTS_SOB_DEMANDA!r} if m in sys.modules],
+}}))
+'''
+
+def _ler_importtime(saida):
+    """[(módulo, próprio_ms, acumulado_ms, profundidade)] da saída de `python -X importtime`"""
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        profundidade = (len(nome) - len(nome.lstrip()) - 1) // 2
+        modulos.append((nome.strip(), int(proprio) / 1000, int(acumulado) / 1000, profundidade))
+    return modulos
+
+def medir_inicializacao(criar_tabelas=None):
+    """Sobe o app em um processo novo com -X importtime e retorna as medições"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    ambiente = dict(os.environ)
+    if criar_tabelas is not None:
+        ambiente['CRIAR_TABELAS_NA_INICIALIZACAO'] = '1' if criar_tabelas else '0'
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', _SCRIPT_MEDICAO], cwd=raiz,
+                              env=ambiente, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise click.ClickException(f'Falha ao iniciar o app:\n{processo.stderr[-2000:]}')
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    modulos = _ler_importtime(processo.stderr)
+    projeto = {os.path.splitext(arquivo)[0] for arquivo in os.listdir(raiz) if arquivo.endswith('.py')}
+    resultado['projeto'] = sorted(((nome, acumulado) for nome, _, acumulado, _ in modulos if nome in projeto),
+                                  key=lambda m: m[1], reverse=True)
+    # Pacotes de terceiros pelo tempo total (o import do pacote raiz inclui os submódulos)
+    resultado['dependencias'] = sorted(((nome, acumulado) for nome, _, acumulado, _ in modulos
+                                        if '.' not in nome and nome not in projeto),
+                                       key=lambda m: m[1], reverse=True)
+    return resultado
+
+@click.command('tempo-inicializacao')
+@click.option('--top', type=int, default=15, show_default=True, help='Dependências listadas')
+@click.option('--criar-tabelas/--sem-criar-tabelas', default=None,
+              help='Força CRIAR_TABELAS_NA_INICIALIZACAO no processo medido (padrão: o do ambiente)')
+def tempo_inicializacao_command(top, criar_tabelas):
+    """Tempo de import por módulo, duração do create_app e memória de um worker recém-iniciado"""
+    r = medir_inicializacao(criar_tabelas)
+    click.echo(f"import do app: {r['importacao_ms']:.0f} ms | create_app: {r['create_app_ms']:.0f} ms | "
+               f"total: {r['importacao_ms'] + r['create_app_ms']:.0f} ms | RSS máx.: {r['rss_mb']:.1f} MB")
+    if r['carregados']:
+        click.echo(f"Carregados no boot (deveriam ser sob demanda): {', '.join(r['carregados'])}")
+    click.echo('\nMódulos do projeto (tempo acumulado):')
+    for nome, acumulado in r['projeto']:
+        click.echo(f'  {nome:<28} {acumulado:>8.1f} ms')
+    click.echo(f'\nDependências mais lentas (top {top}):')
+    for nome, acumulado in r['dependencias'][:top]:
+        click.echo(f'  {nome:<28} {acumulado:>8.1f} ms')
@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from sqlalchemy import and_, false
+from sqlalchemy.orm import joinedload
+
+from cronograma import semanas_execucao
+from hierarquia import caminho_empresa
+from models import db, Empresa, Setor, Area, Equipamento, PlanoInspecao, MapaAnualCache
+
+# ==============================================================================
+# Mapa anual montado a partir de mapa_anual_cache (uma linha por plano e ano)
+# ==============================================================================
+_COLUNAS_ASSINATURA = ('tipo_geracao', 'frequencia', 'data_inicio', 'equipamento_id')
+_COLUNAS_LINHA = ('equipamento_nome', 'equipamento_codigo', 'localizacao', 'semanas', 'atualizado_em')
+
+def _assinatura_valida(plano, cache):
+    """A linha em cache ainda corresponde à configuração atual do plano?"""
+    return (
+        cache.tipo_geracao == plano.tipo_geracao
+        and cache.frequencia == plano.frequencia
+        and cache.data_inicio == plano.data_inicio
+        and cache.equipamento_id == plano.equipamento_id
+    )
+
+def _gravar_linhas(linhas):
+    """Grava as linhas com upsert: duas requisições podem calcular o mesmo (plano, ano) ao mesmo tempo"""
+    tabela = MapaAnualCache.__table__
+    if db.session.get_bind(clause=tabela).dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(tabela)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabela.c.plano_id, tabela.c.ano],
+        set_={coluna: stmt.excluded[coluna] for coluna in _COLUNAS_LINHA + _COLUNAS_ASSINATURA}
+    )
+    db.session.execute(stmt, linhas)
+
+    # Os planos já carregados seguem em uso no template: commit sem expirá-los (evita um SELECT por plano)
+    sessao = db.session()
+    expirar, sessao.expire_on_commit = sessao.expire_on_commit, False
+    try:
+        sessao.commit()
+    finally:
+        sessao.expire_on_commit = expirar
+
+def _calcular_linhas(plano_ids, ano):
+    """Calcula (e grava) as linhas de cache dos planos informados em uma única consulta"""
+    planos = PlanoInspecao.query.options(
+        joinedload(PlanoInspecao.equipamento)
+    ).filter(PlanoInspecao.id.in_(plano_ids)).all()
+
+    linhas = {}
+    for plano in planos:
+        equipamento = plano.equipamento
+        if not equipamento:
+            continue
+        semanas = semanas_execucao(plano.tipo_geracao, plano.frequencia, plano.data_inicio, ano)
+        linhas[plano.id] = {
+            'plano_id': plano.id,
+            'ano': ano,
+            'tipo_geracao': plano.tipo_geracao,
+            'frequencia': plano.frequencia,
+            'data_inicio': plano.data_inicio,
+            'equipamento_id': plano.equipamento_id,
+            'equipamento_nome': equipamento.nome,
+            'equipamento_codigo': equipamento.codigo,
+            'localizacao': equipamento.localizacao or '',
+            'semanas': ','.join(str(s) for s in semanas),
+            'atualizado_em': datetime.utcnow(),
+        }
+    if linhas:
+        _gravar_linhas(list(linhas.values()))
+    return linhas
+
+def montar_mapa_anual(ano):
+    """Lista de planos com as semanas de execução em `ano`, ordenada por localização e equipamento.
+
+    Só planos sem linha em cache (ou com tipo/frequência/início/equipamento
+    alterados) são recalculados; os demais vêm prontos da tabela.
+    """
+    resultado = db.session.query(PlanoInspecao, MapaAnualCache).outerjoin(
+        MapaAnualCache,
+        and_(MapaAnualCache.plano_id == PlanoInspecao.id, MapaAnualCache.ano == ano)
+    ).filter(PlanoInspecao.data_inicio.isnot(None)).all()
+
+    pendentes = {plano.id for plano, cache in resultado if cache is None or not _assinatura_valida(plano, cache)}
+    linhas = {plano.id: {coluna: getattr(cache, coluna) for coluna in _COLUNAS_LINHA}
+              for plano, cache in resultado if plano.id not in pendentes}
+    if pendentes:
+        linhas.update(_calcular_linhas(pendentes, ano))
+
+    mapa_planos = []
+    for plano, _ in resultado:
+        linha = linhas.get(plano.id)
+        if linha is None:
+            continue
+        semanas = [int(s) for s in linha['semanas'].split(',')] if linha['semanas'] else []
+        mapa_planos.append({
+            'plano': plano,
+            'equipamento_nome': linha['equipamento_nome'],
+            'equipamento_codigo': linha['equipamento_codigo'] or '-',
+            'localizacao': linha['localizacao'],
+            'semanas_execucao': semanas,
+            'total_execucoes': len(semanas)
+        })
+
+    mapa_planos.sort(key=lambda x: (x['localizacao'], x['equipamento_nome']))
+    return mapa_planos
+
+# ==============================================================================
+# Invalidação (chamada pelas rotas de planos e da hierarquia)
+# ==============================================================================
+def invalidar_mapa_plano(plano_id):
+    """Descarta as linhas em cache de um plano (todos os anos)"""
+    MapaAnualCache.query.filter(MapaAnualCache.plano_id == plano_id).delete(synchronize_session=False)
+
+def _planos_sob(modelo, registro_id):
+    """Consulta com os ids dos planos cujos equipamentos estão sob o nó da hierarquia"""
+    # Empresa e Setor usam o caminho materializado do equipamento (sem joins pela hierarquia)
+    consulta = db.session.query(PlanoInspecao.id).join(Equipamento, PlanoInspecao.equipamento_id == Equipamento.id)
+    if modelo is Equipamento:
+        return consulta.filter(Equipamento.id == registro_id)
+    if modelo is Empresa:
+        return consulta.filter(Equipamento.caminho.startswith(caminho_empresa(registro_id)))
+    if modelo in (Setor, Area):
+        # Prefixo constante para o LIKE usar o índice de caminho
+        caminho = db.session.scalar(db.select(modelo.caminho).where(modelo.id == registro_id))
+        return consulta.filter(Equipamento.caminho.startswith(caminho) if caminho else false())
+    raise ValueError(f'Nível da hierarquia sem efeito no mapa anual: {modelo.__name__}')
+
+def invalidar_mapa_hierarquia(modelo, registro_id):
+    """Descarta as linhas dos planos afetados pela alteração de nome de Empresa, Setor, Área ou Equipamento"""
+    MapaAnualCache.query.filter(
+        MapaAnualCache.plano_id.in_(_planos_sob(modelo, registro_id).scalar_subquery())
+    ).delete(synchronize_session=False)
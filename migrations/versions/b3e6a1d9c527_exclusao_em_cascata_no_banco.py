@@ -0,0 +1,75 @@
+"""Exclusão em cascata no banco (ON DELETE CASCADE / SET NULL) na hierarquia, planos e ordens
+
+Revision ID: b3e6a1d9c527
+Revises: f2b8c5a7d430
+Create Date: 2026-10-18 15:42:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e6a1d9c527'
+down_revision = 'f2b8c5a7d430'
+branch_labels = None
+depends_on = None
+
+# tabela: [(coluna, tabela referenciada, ondelete)]
+CHAVES = {
+    'setor': [('empresa_id', 'empresa', 'CASCADE')],
+    'area': [('setor_id', 'setor', 'CASCADE')],
+    'conjunto': [('area_id', 'area', 'CASCADE')],
+    'subconjunto': [('conjunto_id', 'conjunto', 'CASCADE')],
+    'equipamento': [
+        ('subconjunto_id', 'subconjunto', 'CASCADE'),
+        ('empresa_id', 'empresa', 'CASCADE'),
+        ('setor_id', 'setor', 'CASCADE'),
+        ('area_id', 'area', 'CASCADE'),
+    ],
+    'componente': [('equipamento_id', 'equipamento', 'CASCADE')],
+    'plano_inspecao': [('equipamento_id', 'equipamento', 'CASCADE')],
+    'item_inspecao': [('plano_id', 'plano_inspecao', 'CASCADE')],
+    'ordem_execucao': [
+        ('plano_id', 'plano_inspecao', 'CASCADE'),
+        ('setor_id', 'setor', 'SET NULL'),
+        ('area_id', 'area', 'SET NULL'),
+        ('equipamento_id', 'equipamento', 'SET NULL'),
+    ],
+    'item_inspecao_apontado': [
+        ('item_inspecao_id', 'item_inspecao', 'CASCADE'),
+        ('ordem_id', 'ordem_execucao', 'CASCADE'),
+    ],
+}
+
+# As FKs antigas foram criadas sem nome: no PostgreSQL o nome gerado é lido do catálogo;
+# no SQLite (sem nome algum) a convenção permite ao batch_alter_table localizá-las
+CONVENCAO = {'fk': 'fk_%(table_name)s_%(column_0_name)s'}
+
+
+def _nomes_atuais(tabela):
+    inspetor = sa.inspect(op.get_bind())
+    return {
+        tuple(fk['constrained_columns']): fk['name'] or f"fk_{tabela}_{fk['constrained_columns'][0]}"
+        for fk in inspetor.get_foreign_keys(tabela)
+    }
+
+
+def _recriar_chaves(ondelete_ativo):
+    for tabela, chaves in CHAVES.items():
+        nomes = _nomes_atuais(tabela)
+        with op.batch_alter_table(tabela, schema=None, naming_convention=CONVENCAO) as batch_op:
+            for coluna, referencia, ondelete in chaves:
+                batch_op.drop_constraint(nomes[(coluna,)], type_='foreignkey')
+                batch_op.create_foreign_key(
+                    f'fk_{tabela}_{coluna}', referencia, [coluna], ['id'],
+                    ondelete=ondelete if ondelete_ativo else None
+                )
+
+
+def upgrade():
+    _recriar_chaves(ondelete_ativo=True)
+
+
+def downgrade():
+    _recriar_chaves(ondelete_ativo=False)
@@ -0,0 +1,50 @@
+"""Caminho materializado (caminho) nas tabelas da hierarquia
+
+Revision ID: d81e6c4b2f95
+Revises: a7d3f9e2c614
+Create Date: 2026-10-18 12:21:40.886213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81e6c4b2f95'
+down_revision = 'a7d3f9e2c614'
+branch_labels = None
+depends_on = None
+
+# (tabela, coluna do pai, tabela pai) do nível mais alto ao mais baixo
+NIVEIS = [
+    ('setor', 'empresa_id', None),
+    ('area', 'setor_id', 'setor'),
+    ('conjunto', 'area_id', 'area'),
+    ('subconjunto', 'conjunto_id', 'conjunto'),
+    ('equipamento', 'subconjunto_id', 'subconjunto'),
+    ('componente', 'equipamento_id', 'equipamento'),
+]
+
+
+def upgrade():
+    for tabela, _, _ in NIVEIS:
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('caminho', sa.String(length=120), nullable=True))
+            batch_op.create_index(f'ix_{tabela}_caminho', ['caminho'], unique=False,
+                                  postgresql_ops={'caminho': 'varchar_pattern_ops'})
+
+    # Preenche os caminhos nível a nível a partir das FKs existentes
+    for tabela, coluna, pai in NIVEIS:
+        if pai is None:
+            caminho_pai = f"CAST({coluna} AS VARCHAR)"
+            op.execute(f"UPDATE {tabela} SET caminho = {caminho_pai} || '/' || CAST(id AS VARCHAR) || '/'")
+        else:
+            caminho_pai = f"(SELECT {pai}.caminho FROM {pai} WHERE {pai}.id = {tabela}.{coluna})"
+            op.execute(f"UPDATE {tabela} SET caminho = {caminho_pai} || CAST(id AS VARCHAR) || '/'")
+
+
+def downgrade():
+    for tabela, _, _ in reversed(NIVEIS):
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{tabela}_caminho')
+            batch_op.drop_column('caminho')
@@ -0,0 +1,26 @@
+"""Descarta as linhas de mapa_anual_cache dos planos por hora (gravadas sem execuções)
+
+Revision ID: e5a2c8d1f746
+Revises: b3e6a1d9c527
+Create Date: 2026-10-18 15:20:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a2c8d1f746'
+down_revision = 'b3e6a1d9c527'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O cronograma não reconhecia 'horario' (valor gravado pelo formulário) e o mapa anual
+    # guardou essas linhas sem semanas; a assinatura não mudou, então são recalculadas no próximo acesso
+    op.execute("DELETE FROM mapa_anual_cache WHERE tipo_geracao = 'horario'")
+
+
+def downgrade():
+    pass
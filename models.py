@@ -1,14 +1,41 @@
+import sqlite3
+from dataclasses import dataclass
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin, LoginManager
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+from cache import CacheTTL
+from replica import SessaoRoteada
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 login_manager = LoginManager()
 
+@event.listens_for(Engine, 'connect')
+def _ativar_chaves_estrangeiras_sqlite(conexao_dbapi, registro_conexao):
+    """No SQLite o ON DELETE CASCADE só vale com a pragma foreign_keys ativa em cada conexão"""
+    if isinstance(conexao_dbapi, sqlite3.Connection):
+        cursor = conexao_dbapi.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
 # ==============================================================================
 # Usuário e Autenticação
 # ==============================================================================
+def metodo_hash_senha():
+    return current_app.config.get('SENHA_HASH_METODO', 'scrypt:32768:8:1')
+
+@lru_cache(maxsize=8)
+def prefixo_hash_senha(metodo):
+    """Prefixo gravado no hash pelo método (o werkzeug completa os parâmetros omitidos:
+    'scrypt' vira 'scrypt:32768:8:1' e 'pbkdf2:sha256' recebe o número de iterações)"""
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
@@ -27,7 +54,11 @@ class User(UserMixin, db.Model):
     ordens_executadas = db.relationship('OrdemExecucao', backref='executante', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=metodo_hash_senha())
+
+    def hash_desatualizado(self):
+        """Hash gerado com método/custo diferente do configurado em SENHA_HASH_METODO"""
+        return self.password_hash.split('$', 1)[0] != prefixo_hash_senha(metodo_hash_senha())
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -35,13 +66,67 @@ class User(UserMixin, db.Model):
     def is_admin(self):
         return self.perfil_acesso == 'administrador'
 
+def _executar_no_primario(consulta):
+    # Login e permissões não podem esperar a réplica (replica.py): um usuário recém-criado
+    # ainda não existe nela e um rebaixamento ainda não chegou
+    return db.session.execute(consulta, bind_arguments={'bind': db.engine})
+
+def perfil_acesso_atual(user_id):
+    """perfil_acesso lido do banco primário (uma vez por requisição)"""
+    consulta = db.select(User.perfil_acesso).where(User.id == user_id)
+    if not has_request_context():
+        return _executar_no_primario(consulta).scalar()
+    perfis = g.setdefault('perfis_acesso', {})
+    if user_id not in perfis:
+        perfis[user_id] = _executar_no_primario(consulta).scalar()
+    return perfis[user_id]
+
+@dataclass(frozen=True)
+class UsuarioSessao(UserMixin):
+    """Dados do usuário logado mantidos em cache (current_user); não é uma entidade do ORM.
+
+    O perfil fica fora do cache: invalidar_usuario só limpa o processo atual, e um
+    administrador rebaixado ou excluído manteria o acesso nos outros workers.
+    """
+    id: int
+    username: str
+    nome: str
+
+    def is_admin(self):
+        return perfil_acesso_atual(self.id) == 'administrador'
+
+# Cache por processo: com vários workers, a alteração de um usuário chega aos demais em até USUARIO_CACHE_TTL
+cache_usuarios = CacheTTL(ttl=60, max_entradas=1024)
+
+def invalidar_usuario(user_id):
+    """Descarta o usuário do cache (chamar após o commit da edição ou exclusão)"""
+    cache_usuarios.invalidar(int(user_id))
+
+def _carregar_usuario(user_id):
+    linha = _executar_no_primario(
+        db.select(User.id, User.username, User.nome).where(User.id == user_id)
+    ).first()
+    return UsuarioSessao(*linha) if linha else None
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    ttl = current_app.config.get('USUARIO_CACHE_TTL', 60)
+    if not ttl:
+        return _carregar_usuario(user_id)
+    usuario = cache_usuarios.obter(user_id)
+    if usuario is None:
+        usuario = _carregar_usuario(user_id)
+        # Usuário não encontrado não vai para o cache: o próximo acesso consulta de novo
+        if usuario is not None:
+            cache_usuarios.definir(user_id, usuario, ttl=ttl)
+    return usuario
 
 # ==============================================================================
 # Hierarquia de Equipamentos (Adicionado index=True nas Foreign Keys)
 # ==============================================================================
+# As exclusões descem pela hierarquia no banco (ON DELETE CASCADE); passive_deletes evita
+# que o ORM carregue os filhos para excluí-los um a um (ver hierarquia.excluir_no)
 class Empresa(db.Model):
     __tablename__ = 'empresa'
     id = db.Column(db.Integer, primary_key=True)
@@ -53,39 +138,60 @@ class Empresa(db.Model):
     logo_filename = db.Column(db.String(255))  # Nome do arquivo do logo
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
 
-    setores = db.relationship('Setor', backref='empresa', cascade='all, delete-orphan', lazy=True)
+    setores = db.relationship('Setor', backref='empresa', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
 
 class Setor(db.Model):
     __tablename__ = 'setor'
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
-    empresa_id = db.Column(db.Integer, db.ForeignKey('empresa.id'), nullable=False, index=True) # Otimização
+    empresa_id = db.Column(db.Integer, db.ForeignKey('empresa.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
+
+    areas = db.relationship('Area', backref='setor', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
 
-    areas = db.relationship('Area', backref='setor', cascade='all, delete-orphan', lazy=True)
+    # Caminho materializado (ids de empresa até o próprio nó, ex.: "1/4/9/"), mantido por hierarquia.py
+    caminho = db.Column(db.String(120))
+    __table_args__ = (
+        db.Index('ix_setor_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 class Area(db.Model):
     __tablename__ = 'area'
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
-    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=False, index=True) # Otimização
+    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
+
+    conjuntos = db.relationship('Conjunto', backref='area', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
 
-    conjuntos = db.relationship('Conjunto', backref='area', cascade='all, delete-orphan', lazy=True)
+    caminho = db.Column(db.String(120))  # Ver Setor.caminho
+    __table_args__ = (
+        db.Index('ix_area_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 class Conjunto(db.Model):
     __tablename__ = 'conjunto'
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
-    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable=False, index=True) # Otimização
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
 
-    subconjuntos = db.relationship('Subconjunto', backref='conjunto', cascade='all, delete-orphan', lazy=True)
+    subconjuntos = db.relationship('Subconjunto', backref='conjunto', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+
+    caminho = db.Column(db.String(120))  # Ver Setor.caminho
+    __table_args__ = (
+        db.Index('ix_conjunto_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 class Subconjunto(db.Model):
     __tablename__ = 'subconjunto'
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
-    conjunto_id = db.Column(db.Integer, db.ForeignKey('conjunto.id'), nullable=False, index=True) # Otimização
+    conjunto_id = db.Column(db.Integer, db.ForeignKey('conjunto.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
+
+    equipamentos = db.relationship('Equipamento', backref='subconjunto', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
 
-    equipamentos = db.relationship('Equipamento', backref='subconjunto', cascade='all, delete-orphan', lazy=True)
+    caminho = db.Column(db.String(120))  # Ver Setor.caminho
+    __table_args__ = (
+        db.Index('ix_subconjunto_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 class Equipamento(db.Model):
     __tablename__ = 'equipamento'
@@ -93,15 +199,29 @@ class Equipamento(db.Model):
     nome = db.Column(db.String(120), nullable=False)
     # AJUSTE: Adicionado index=True
     codigo = db.Column(db.String(50), index=True) 
-    subconjunto_id = db.Column(db.Integer, db.ForeignKey('subconjunto.id'), nullable=False, index=True) # Otimização
+    subconjunto_id = db.Column(db.Integer, db.ForeignKey('subconjunto.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
+
+    # Localização desnormalizada (mantida por hierarquia.py a partir do subconjunto)
+    empresa_id = db.Column(db.Integer, db.ForeignKey('empresa.id', ondelete='CASCADE'), index=True)
+    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id', ondelete='CASCADE'), index=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id', ondelete='CASCADE'), index=True)
+    localizacao = db.Column(db.String(400))  # "Empresa > Setor > Área"
 
     # NOVOS CAMPOS DE GESTÃO DE ATIVOS (ISO 55000)
     criticidade = db.Column(db.String(50), default='C') # Ex: A, B, C (para priorização)
     valor_aquisicao = db.Column(db.Float) # Para cálculo do Custo do Ciclo de Vida
 
-    planos = db.relationship('PlanoInspecao', backref='equipamento', cascade='all, delete-orphan', lazy=True)
+    planos = db.relationship('PlanoInspecao', backref='equipamento', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
     # NOVA RELAÇÃO: Componentes
-    componentes = db.relationship('Componente', backref='equipamento', cascade='all, delete-orphan', lazy=True)
+    componentes = db.relationship('Componente', backref='equipamento', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+    empresa = db.relationship('Empresa', foreign_keys=[empresa_id], viewonly=True)
+    setor = db.relationship('Setor', foreign_keys=[setor_id], viewonly=True)
+    area = db.relationship('Area', foreign_keys=[area_id], viewonly=True)
+
+    caminho = db.Column(db.String(120))  # Ver Setor.caminho
+    __table_args__ = (
+        db.Index('ix_equipamento_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 # NOVO MODELO: Componente (Peça/Elemento)
 class Componente(db.Model):
@@ -112,7 +232,12 @@ class Componente(db.Model):
     vida_util_estimada = db.Column(db.Float) # Para auxiliar a manutenção preditiva/preventiva
 
     # Foreign Key ligando ao Equipamento (Otimizado)
-    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id'), nullable=False, index=True) 
+    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id', ondelete='CASCADE'), nullable=False, index=True) 
+
+    caminho = db.Column(db.String(120))  # Ver Setor.caminho
+    __table_args__ = (
+        db.Index('ix_componente_caminho', 'caminho', postgresql_ops={'caminho': 'varchar_pattern_ops'}),
+    )
 
 # ==============================================================================
 # Planos e Ordens
@@ -122,14 +247,14 @@ class PlanoInspecao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
-    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id'), nullable=False, index=True) # Otimização
+    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
 
     tipo_geracao = db.Column(db.String(50))
     frequencia = db.Column(db.Float)
     data_inicio = db.Column(db.DateTime)
 
-    itens = db.relationship('ItemInspecao', backref='plano', cascade='all, delete-orphan', lazy=True)
-    ordens = db.relationship('OrdemExecucao', backref='plano', cascade='all, delete-orphan', lazy=True)
+    itens = db.relationship('ItemInspecao', backref='plano', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+    ordens = db.relationship('OrdemExecucao', backref='plano', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
 
 class ItemInspecao(db.Model):
     __tablename__ = 'item_inspecao'
@@ -144,7 +269,7 @@ class ItemInspecao(db.Model):
 
     # AJUSTE: Campos de resultado de execução (valor_atual, falha, solucao, etc.) removidos daqui, pois pertencem à Ordem/Apontamento.
 
-    plano_id = db.Column(db.Integer, db.ForeignKey('plano_inspecao.id'), nullable=False, index=True) # Otimização
+    plano_id = db.Column(db.Integer, db.ForeignKey('plano_inspecao.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
 
 class OrdemExecucao(db.Model):
     __tablename__ = 'ordem_execucao'
@@ -154,13 +279,13 @@ class OrdemExecucao(db.Model):
     tipo_ordem = db.Column(db.String(50), default='programada', nullable=False, index=True)
     
     # Relações (plano é nullable para ordens não programadas)
-    plano_id = db.Column(db.Integer, db.ForeignKey('plano_inspecao.id'), nullable=True, index=True)
+    plano_id = db.Column(db.Integer, db.ForeignKey('plano_inspecao.id', ondelete='CASCADE'), nullable=True, index=True)
     executante_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     # Para ordens não programadas - navegação hierárquica
-    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=True, index=True)
-    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable=True, index=True)
-    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id'), nullable=True, index=True)
+    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id', ondelete='SET NULL'), nullable=True, index=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id', ondelete='SET NULL'), nullable=True, index=True)
+    equipamento_id = db.Column(db.Integer, db.ForeignKey('equipamento.id', ondelete='SET NULL'), nullable=True, index=True)
     
     # Campos de planejamento
     data_programada = db.Column(db.DateTime, nullable=False, index=True)
@@ -175,18 +300,23 @@ class OrdemExecucao(db.Model):
     data_conclusao = db.Column(db.DateTime)
     status = db.Column(db.String(50), default='pendente', index=True)
 
-    itens_apontados = db.relationship('ItemInspecaoApontado', backref='ordem', cascade='all, delete-orphan', lazy=True)
+    itens_apontados = db.relationship('ItemInspecaoApontado', backref='ordem', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
     
     # Relacionamentos adicionais para ordens não programadas
-    setor = db.relationship('Setor', foreign_keys=[setor_id], backref='ordens')
-    area = db.relationship('Area', foreign_keys=[area_id], backref='ordens')
-    equipamento_direto = db.relationship('Equipamento', foreign_keys=[equipamento_id], backref='ordens_diretas')
+    setor = db.relationship('Setor', foreign_keys=[setor_id], backref=db.backref('ordens', passive_deletes=True))
+    area = db.relationship('Area', foreign_keys=[area_id], backref=db.backref('ordens', passive_deletes=True))
+    equipamento_direto = db.relationship('Equipamento', foreign_keys=[equipamento_id], backref=db.backref('ordens_diretas', passive_deletes=True))
+
+    # Índice composto para a paginação por cursor (data_programada DESC, id DESC)
+    __table_args__ = (
+        db.Index('ix_ordem_execucao_data_programada_id', 'data_programada', 'id'),
+    )
 
 class ItemInspecaoApontado(db.Model):
     __tablename__ = 'item_inspecao_apontado'
     id = db.Column(db.Integer, primary_key=True)
-    item_inspecao_id = db.Column(db.Integer, db.ForeignKey('item_inspecao.id'), nullable=False, index=True) # Otimização
-    ordem_id = db.Column(db.Integer, db.ForeignKey('ordem_execucao.id'), nullable=False, index=True) # Otimização
+    item_inspecao_id = db.Column(db.Integer, db.ForeignKey('item_inspecao.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
+    ordem_id = db.Column(db.Integer, db.ForeignKey('ordem_execucao.id', ondelete='CASCADE'), nullable=False, index=True) # Otimização
 
     # Campos de Resultado de Execução (Correto: pertencem a esta tabela)
     resultado = db.Column(db.String(50)) 
@@ -201,4 +331,38 @@ class ItemInspecaoApontado(db.Model):
     materiais = db.Column(db.Text)
     outros = db.Column(db.Text)
 
-    item_inspecao = db.relationship('ItemInspecao', backref='apontamentos', lazy=True)
\ No newline at end of file
+    item_inspecao = db.relationship('ItemInspecao', backref='apontamentos', lazy=True)
+
+    # Um apontamento por item em cada ordem (permite INSERT ... ON CONFLICT no checklist)
+    __table_args__ = (
+        db.UniqueConstraint('ordem_id', 'item_inspecao_id', name='uq_item_inspecao_apontado_ordem_item'),
+    )
+
+# ==============================================================================
+# Agregações do Dashboard
+# ==============================================================================
+class OrdemResumoMensal(db.Model):
+    """Contagem de ordens por mês × tipo × status, mantida a cada flush (ver dashboard.py)"""
+    __tablename__ = 'ordem_resumo_mensal'
+    mes = db.Column(db.Date, primary_key=True)  # Primeiro dia do mês de data_programada
+    tipo_ordem = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class MapaAnualCache(db.Model):
+    """Semanas de execução e localização de um plano em um ano (ver mapa_anual.py)"""
+    __tablename__ = 'mapa_anual_cache'
+    plano_id = db.Column(db.Integer, db.ForeignKey('plano_inspecao.id', ondelete='CASCADE'), primary_key=True)
+    ano = db.Column(db.Integer, primary_key=True)
+
+    # Assinatura do plano no momento do cálculo (divergência => recalcular)
+    tipo_geracao = db.Column(db.String(50))
+    frequencia = db.Column(db.Float)
+    data_inicio = db.Column(db.DateTime)
+    equipamento_id = db.Column(db.Integer)
+
+    equipamento_nome = db.Column(db.String(120))
+    equipamento_codigo = db.Column(db.String(50))
+    localizacao = db.Column(db.String(255))
+    semanas = db.Column(db.Text)  # Números das semanas separados por vírgula
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
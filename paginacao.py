@@ -0,0 +1,101 @@
+import base64
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, tuple_
+
+from models import OrdemExecucao, PlanoInspecao
+
+# ==============================================================================
+# Filtros de ordens (lista /ordens e /api/dashboard/ordens)
+# ==============================================================================
+def _inteiro(valor):
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d') if valor else None
+    except ValueError:
+        return None
+
+def ler_filtros_ordens(args):
+    """Extrai da query string os filtros aceitos (valores inválidos são ignorados)"""
+    return {
+        'status': args.get('status') or None,
+        'tipo_ordem': args.get('tipo_ordem') or None,
+        'executante_id': _inteiro(args.get('executante_id')),
+        'equipamento_id': _inteiro(args.get('equipamento_id')),
+        'data_inicio': _data(args.get('data_inicio')),
+        'data_fim': _data(args.get('data_fim')),
+    }
+
+def filtrar_ordens(query, filtros):
+    """Aplica os filtros no banco (WHERE) em vez de filtrar a lista em Python"""
+    if filtros.get('status'):
+        query = query.filter(OrdemExecucao.status == filtros['status'])
+    if filtros.get('tipo_ordem'):
+        query = query.filter(OrdemExecucao.tipo_ordem == filtros['tipo_ordem'])
+    if filtros.get('executante_id'):
+        query = query.filter(OrdemExecucao.executante_id == filtros['executante_id'])
+    if filtros.get('equipamento_id'):
+        # Programadas chegam ao equipamento pelo plano; não programadas pela coluna direta
+        planos_do_equipamento = PlanoInspecao.query.with_entities(PlanoInspecao.id).filter(
+            PlanoInspecao.equipamento_id == filtros['equipamento_id']
+        )
+        query = query.filter(or_(
+            OrdemExecucao.equipamento_id == filtros['equipamento_id'],
+            OrdemExecucao.plano_id.in_(planos_do_equipamento.scalar_subquery())
+        ))
+    if filtros.get('data_inicio'):
+        query = query.filter(OrdemExecucao.data_programada >= filtros['data_inicio'])
+    if filtros.get('data_fim'):
+        query = query.filter(OrdemExecucao.data_programada <= filtros['data_fim'] + timedelta(days=1, seconds=-1))
+    return query
+
+# ==============================================================================
+# Paginação por cursor (keyset) em (data_programada DESC, id DESC)
+# ==============================================================================
+def codificar_cursor(ordem):
+    bruto = f'{ordem.data_programada.isoformat()}|{ordem.id}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Retorna (data_programada, id) do cursor, ou None se ausente/inválido"""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data_str, id_str = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(data_str), int(id_str)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def tamanho_pagina(valor):
+    """Tamanho de página solicitado, limitado a Config.ORDENS_POR_PAGINA_MAX"""
+    padrao = current_app.config.get('ORDENS_POR_PAGINA', 50)
+    maximo = current_app.config.get('ORDENS_POR_PAGINA_MAX', 200)
+    limite = _inteiro(valor) or padrao
+    return max(1, min(limite, maximo))
+
+def paginar_ordens(query, cursor=None, limite=50):
+    """Retorna (ordens da página, cursor da próxima página ou None).
+
+    Usa o índice (data_programada, id): o custo de cada página não depende
+    de quantas páginas vieram antes, ao contrário de OFFSET.
+    """
+    posicao = decodificar_cursor(cursor)
+    if posicao:
+        query = query.filter(tuple_(OrdemExecucao.data_programada, OrdemExecucao.id) < tuple_(*posicao))
+
+    ordens = query.order_by(
+        OrdemExecucao.data_programada.desc(), OrdemExecucao.id.desc()
+    ).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(ordens) > limite:
+        ordens = ordens[:limite]
+        proximo_cursor = codificar_cursor(ordens[-1])
+    return ordens, proximo_cursor
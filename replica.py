@@ -0,0 +1,67 @@
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# ==============================================================================
+# Réplica de leitura (Config.DATABASE_REPLICA_URL)
+# ==============================================================================
+# Chave do bind em SQLALCHEMY_BINDS; nenhum model usa esse bind, ele só recebe leituras
+BIND_REPLICA = 'replica'
+
+def _ler_da_replica():
+    return has_request_context() and g.get('ler_da_replica', False)
+
+def lendo_da_replica():
+    """As consultas desta requisição vão para a réplica (que pode estar atrasada)?"""
+    return _ler_da_replica() and bool(current_app.config.get('DATABASE_REPLICA_URL'))
+
+class SessaoRoteada(Session):
+    """Sessão do db que envia as consultas das rotas @leitura_replica para a réplica.
+
+    Flushes, INSERT/UPDATE/DELETE executados direto (Core) e binds explícitos vão
+    sempre para o primário; sem réplica configurada se comporta como a sessão padrão.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) and _ler_da_replica():
+            replica = self._db.engines.get(BIND_REPLICA)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(SessaoRoteada, 'after_flush')
+def _marcar_escrita(sessao, contexto_flush):
+    if has_request_context():
+        g.escreveu_no_primario = True
+
+@event.listens_for(SessaoRoteada, 'do_orm_execute')
+def _marcar_escrita_core(estado):
+    # Gravações em lote por session.execute(insert(...)) não passam pelo flush
+    if (estado.is_insert or estado.is_update or estado.is_delete) and has_request_context():
+        g.escreveu_no_primario = True
+
+def _leitura_no_primario():
+    # Read-your-writes: quem acabou de gravar lê do primário até a réplica alcançar
+    return session.get('primario_ate', 0) > time.time()
+
+def leitura_replica(f):
+    """Rota somente leitura: as consultas vão para a réplica (se configurada)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.ler_da_replica = not _leitura_no_primario()
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _registrar_escrita(resposta):
+    if g.pop('escreveu_no_primario', False):
+        session['primario_ate'] = time.time() + current_app.config['REPLICA_ATRASO_MAX']
+    return resposta
+
+def instalar_replica(app):
+    """Ativa o read-your-writes quando há réplica (Config.DATABASE_REPLICA_URL)"""
+    if not app.config.get('DATABASE_REPLICA_URL'):
+        return
+    app.after_request(_registrar_escrita)
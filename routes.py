@@ -1,14 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_user, logout_user, login_required, current_user
 # IMPORT COMPLETO COM NOVO MODELO COMPONENTE
-from models import db, User, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, PlanoInspecao, ItemInspecao, OrdemExecucao, ItemInspecaoApontado, Componente 
-from utils import gerar_pdf, gerar_excel
+from models import db, User, Empresa, Setor, Area, Conjunto, Subconjunto, Equipamento, PlanoInspecao, ItemInspecao, OrdemExecucao, Componente, invalidar_usuario
+from utils import gerar_excel
+from cache_pdf import enviar_pdf, chave_conteudo, registro_como_dict, versao_template, assinatura_arquivo
+from dashboard import resumo_dashboard, contagem_ordens_cache
+from cronograma import semanas_do_ano
+from mapa_anual import montar_mapa_anual, invalidar_mapa_plano, invalidar_mapa_hierarquia
+from geracao_ordens import gerar_ordens_em_lote
+from paginacao import ler_filtros_ordens, filtrar_ordens, paginar_ordens, tamanho_pagina
+from exportacao import exportar_ordens
+from apontamentos import salvar_apontamentos
+from importacao_hierarquia import importar_hierarquia, ler_planilha
+from importacao_usuarios import importar_usuarios
+from diagnostico_sql import estatisticas_sql
+from fila_pdf import CHAVE_VALIDA, estatisticas_fila_pdf, resposta_pdf, situacao_pdf
+from replica import leitura_replica
+from hierarquia import excluir_no, filhos_do_no, resposta_cascata, setores_da_empresa, areas_do_setor, equipamentos_da_area
 from datetime import datetime, timedelta
-import pandas as pd
 from functools import wraps
 # IMPORTAÇÕES ESSENCIAIS PARA OTIMIZAÇÃO DE CONSULTAS
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func
 # IMPORTAÇÕES PARA UPLOAD DE ARQUIVOS
 import os
 from werkzeug.utils import secure_filename
@@ -31,6 +43,7 @@ def admin_required(f):
 # Rotas de Navegação e Autenticação
 # ==============================================================================
 @main_bp.route('/')
+@leitura_replica
 def index():
     if current_user.is_authenticated:
         total_equipamentos = Equipamento.query.count()
@@ -56,6 +69,9 @@ def login():
         user = User.query.filter_by(username=username).first()
 
         if user and user.check_password(password):
+            if user.hash_desatualizado():
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             flash(f'Bem-vindo, {user.username}!', 'success')
             return redirect(url_for('main.index'))
@@ -90,6 +106,27 @@ def empresas():
     empresas = Empresa.query.order_by(Empresa.nome).all()
     return render_template('empresas.html', empresas=empresas)
 
+@main_bp.route('/empresas/importar', methods=['POST'])
+@login_required
+@admin_required
+def importar_hierarquia_planilha():
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        flash('Selecione um arquivo .xlsx ou .csv para importar.', 'danger')
+        return redirect(url_for('main.empresas'))
+
+    try:
+        resultado = importar_hierarquia(ler_planilha(arquivo.stream, arquivo.filename))
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Erro ao importar: {e}', 'danger')
+        return redirect(url_for('main.empresas'))
+
+    flash(f"{resultado['importadas']} de {resultado['linhas']} linhas importadas.",
+          'success' if not resultado['erros'] else 'warning')
+    empresas = Empresa.query.order_by(Empresa.nome).all()
+    return render_template('empresas.html', empresas=empresas, importacao=resultado)
+
 @main_bp.route('/empresas/<int:empresa_id>/editar', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -98,6 +135,8 @@ def editar_empresa(empresa_id):
     if request.method == 'POST':
         nome = request.form.get('nome')
         if nome:
+            if empresa.nome != nome:
+                invalidar_mapa_hierarquia(Empresa, empresa.id)
             empresa.nome = nome
             empresa.cnpj = request.form.get('cnpj', '').strip()
             empresa.cep = request.form.get('cep', '').strip()
@@ -156,7 +195,7 @@ def editar_empresa(empresa_id):
 @admin_required
 def deletar_empresa(empresa_id):
     empresa = Empresa.query.get_or_404(empresa_id)
-    db.session.delete(empresa)
+    excluir_no(empresa)
     db.session.commit()
     flash('Empresa excluída com sucesso!', 'success')
     return redirect(url_for('main.empresas'))
@@ -178,7 +217,9 @@ def adicionar_setor(empresa_id):
 @login_required
 def ver_empresa(empresa_id):
     empresa = Empresa.query.get_or_404(empresa_id)
-    return render_template('ver_empresa.html', empresa=empresa)
+    # Só o primeiro nível vem com a página; os demais são buscados ao expandir cada nó
+    setores = filhos_do_no('empresa', empresa.id)
+    return render_template('ver_empresa.html', empresa=empresa, setores=setores)
 
 # ==============================================================================
 # Rotas de CRUD da Hierarquia (Setor, Área, Conjunto, Subconjunto)
@@ -190,6 +231,8 @@ def editar_setor(setor_id):
     setor = Setor.query.get_or_404(setor_id)
     nome = request.form.get('nome')
     if nome:
+        if setor.nome != nome:
+            invalidar_mapa_hierarquia(Setor, setor.id)
         setor.nome = nome
         db.session.commit()
         flash('Setor atualizado com sucesso!', 'success')
@@ -201,7 +244,7 @@ def editar_setor(setor_id):
 def deletar_setor(setor_id):
     setor = Setor.query.get_or_404(setor_id)
     empresa_id = setor.empresa_id
-    db.session.delete(setor)
+    excluir_no(setor)
     db.session.commit()
     flash('Setor excluído com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -226,6 +269,8 @@ def editar_area(area_id):
     area = Area.query.get_or_404(area_id)
     nome = request.form.get('nome')
     if nome:
+        if area.nome != nome:
+            invalidar_mapa_hierarquia(Area, area.id)
         area.nome = nome
         db.session.commit()
         flash('Área atualizada com sucesso!', 'success')
@@ -237,7 +282,7 @@ def editar_area(area_id):
 def deletar_area(area_id):
     area = Area.query.get_or_404(area_id)
     empresa_id = area.setor.empresa_id
-    db.session.delete(area)
+    excluir_no(area)
     db.session.commit()
     flash('Área excluída com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -273,7 +318,7 @@ def editar_conjunto(conjunto_id):
 def deletar_conjunto(conjunto_id):
     conjunto = Conjunto.query.get_or_404(conjunto_id)
     empresa_id = conjunto.area.setor.empresa_id
-    db.session.delete(conjunto)
+    excluir_no(conjunto)
     db.session.commit()
     flash('Conjunto excluído com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -309,7 +354,7 @@ def editar_subconjunto(subconjunto_id):
 def deletar_subconjunto(subconjunto_id):
     subconjunto = Subconjunto.query.get_or_404(subconjunto_id)
     empresa_id = subconjunto.conjunto.area.setor.empresa_id
-    db.session.delete(subconjunto)
+    excluir_no(subconjunto)
     db.session.commit()
     flash('Subconjunto excluído com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -351,21 +396,23 @@ def editar_equipamento(equipamento_id):
     valor_aquisicao = request.form.get('valor_aquisicao') 
 
     if nome:
+        if equipamento.nome != nome or equipamento.codigo != codigo:
+            invalidar_mapa_hierarquia(Equipamento, equipamento.id)
         equipamento.nome = nome
         equipamento.codigo = codigo
         equipamento.criticidade = criticidade
         equipamento.valor_aquisicao = float(valor_aquisicao) if valor_aquisicao else None
         db.session.commit()
         flash('Equipamento atualizado com sucesso!', 'success')
-    return redirect(url_for('main.ver_empresa', empresa_id=equipamento.subconjunto.conjunto.area.setor.empresa_id))
+    return redirect(url_for('main.ver_empresa', empresa_id=equipamento.empresa_id))
 
 @main_bp.route('/equipamentos/<int:equipamento_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def deletar_equipamento(equipamento_id):
     equipamento = Equipamento.query.get_or_404(equipamento_id)
-    empresa_id = equipamento.subconjunto.conjunto.area.setor.empresa_id
-    db.session.delete(equipamento)
+    empresa_id = equipamento.empresa_id
+    excluir_no(equipamento)
     db.session.commit()
     flash('Equipamento excluído com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -393,7 +440,7 @@ def adicionar_componente(equipamento_id):
         db.session.commit()
         flash('Componente adicionado com sucesso!', 'success')
 
-    empresa_id = equipamento.subconjunto.conjunto.area.setor.empresa_id
+    empresa_id = equipamento.empresa_id
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
 
 @main_bp.route('/componentes/<int:componente_id>/editar', methods=['POST'])
@@ -415,14 +462,14 @@ def editar_componente(componente_id):
         except ValueError:
             flash('Erro: A Vida Útil Estimada deve ser um número.', 'danger')
             equipamento = componente.equipamento
-            empresa_id = equipamento.subconjunto.conjunto.area.setor.empresa_id
+            empresa_id = equipamento.empresa_id
             return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
 
     db.session.commit()
 
     flash('Componente atualizado com sucesso!', 'success')
     equipamento = componente.equipamento
-    empresa_id = equipamento.subconjunto.conjunto.area.setor.empresa_id
+    empresa_id = equipamento.empresa_id
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
 
 
@@ -433,9 +480,9 @@ def deletar_componente(componente_id):
     componente = Componente.query.get_or_404(componente_id)
     equipamento = componente.equipamento 
 
-    empresa_id = equipamento.subconjunto.conjunto.area.setor.empresa_id
+    empresa_id = equipamento.empresa_id
 
-    db.session.delete(componente)
+    excluir_no(componente)
     db.session.commit()
     flash('Componente excluído com sucesso!', 'success')
     return redirect(url_for('main.ver_empresa', empresa_id=empresa_id))
@@ -449,7 +496,7 @@ def deletar_componente(componente_id):
 def excluir_setor_ajax(setor_id):
     try:
         setor = Setor.query.get_or_404(setor_id)
-        db.session.delete(setor)
+        excluir_no(setor)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -461,7 +508,7 @@ def excluir_setor_ajax(setor_id):
 def excluir_area_ajax(area_id):
     try:
         area = Area.query.get_or_404(area_id)
-        db.session.delete(area)
+        excluir_no(area)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -473,7 +520,7 @@ def excluir_area_ajax(area_id):
 def excluir_conjunto_ajax(conjunto_id):
     try:
         conjunto = Conjunto.query.get_or_404(conjunto_id)
-        db.session.delete(conjunto)
+        excluir_no(conjunto)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -485,7 +532,7 @@ def excluir_conjunto_ajax(conjunto_id):
 def excluir_subconjunto_ajax(subconjunto_id):
     try:
         subconjunto = Subconjunto.query.get_or_404(subconjunto_id)
-        db.session.delete(subconjunto)
+        excluir_no(subconjunto)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -497,7 +544,7 @@ def excluir_subconjunto_ajax(subconjunto_id):
 def excluir_equipamento_ajax(equipamento_id):
     try:
         equipamento = Equipamento.query.get_or_404(equipamento_id)
-        db.session.delete(equipamento)
+        excluir_no(equipamento)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -509,7 +556,7 @@ def excluir_equipamento_ajax(equipamento_id):
 def excluir_componente_ajax(componente_id):
     try:
         componente = Componente.query.get_or_404(componente_id)
-        db.session.delete(componente)
+        excluir_no(componente)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -522,136 +569,24 @@ def excluir_componente_ajax(componente_id):
 @login_required
 def mapa_anual_planos():
     """Mapa de 52 semanas mostrando quando cada plano deve ser executado"""
-    from datetime import date, timedelta
-    
-    # Buscar todos os planos ativos com seus equipamentos
-    planos = PlanoInspecao.query.options(
-        joinedload(PlanoInspecao.equipamento)
-        .joinedload(Equipamento.subconjunto)
-        .joinedload(Subconjunto.conjunto)
-        .joinedload(Conjunto.area)
-        .joinedload(Area.setor)
-        .joinedload(Setor.empresa)
-    ).all()
+    from datetime import date
     
-    # Determinar o ano atual
+    # Ano exibido (padrão: ano atual); semanas ISO 8601 (52 ou 53)
     hoje = date.today()
-    ano_atual = hoje.year
+    ano_atual = request.args.get('ano', hoje.year, type=int)
+    if not 1 < ano_atual < 9999:
+        ano_atual = hoje.year
+    semanas = semanas_do_ano(ano_atual)
+    ano_iso_hoje, semana_iso_hoje, _ = hoje.isocalendar()
     
-    # Gerar semanas dinamicamente usando ISO 8601 (suporta 52 ou 53 semanas)
-    primeiro_dia = date(ano_atual, 1, 1)
-    ultimo_dia = date(ano_atual, 12, 31)
-    
-    # Determinar quantas semanas ISO tem o ano atual
-    semanas_no_ano = ultimo_dia.isocalendar()[1]
-    if ultimo_dia.isocalendar()[0] != ano_atual:
-        # Última semana pertence ao próximo ano
-        semanas_no_ano = (ultimo_dia - timedelta(days=7)).isocalendar()[1]
-    
-    semanas = []
-    # Encontrar o primeiro dia de cada semana ISO
-    data_atual = primeiro_dia
-    while data_atual.year == ano_atual or (data_atual.year == ano_atual + 1 and data_atual.isocalendar()[0] == ano_atual):
-        ano_iso, semana_iso, dia_semana = data_atual.isocalendar()
-        
-        if ano_iso == ano_atual:
-            # Encontrar a segunda-feira desta semana ISO
-            inicio_semana = data_atual - timedelta(days=dia_semana - 1)
-            fim_semana = inicio_semana + timedelta(days=6)
-            
-            # Evitar duplicatas
-            if not semanas or semanas[-1]['numero'] != semana_iso:
-                semanas.append({
-                    'numero': semana_iso,
-                    'inicio': inicio_semana,
-                    'fim': fim_semana,
-                    'mes': inicio_semana.strftime('%b')
-                })
-        
-        data_atual += timedelta(days=7)
-        
-        # Parar se já coletamos todas as semanas
-        if len(semanas) >= semanas_no_ano:
-            break
-    
-    # Para cada plano, calcular em quais semanas ele deve ser executado
-    mapa_planos = []
-    for plano in planos:
-        if not plano.data_inicio:
-            continue
-            
-        # Calcular as datas previstas baseado na configuração
-        datas_previstas = []
-        
-        if plano.tipo_geracao == 'diario' and plano.frequencia:
-            # Executar a cada X dias
-            # Converter datetime para date se necessário
-            data_atual = plano.data_inicio.date() if hasattr(plano.data_inicio, 'date') else plano.data_inicio
-            # Continuar até passar do fim do ano atual
-            while data_atual <= ultimo_dia:
-                # Adicionar apenas datas dentro do ano atual
-                if data_atual >= primeiro_dia and data_atual <= ultimo_dia:
-                    datas_previstas.append(data_atual)
-                data_atual = data_atual + timedelta(days=int(plano.frequencia))
-        
-        elif plano.tipo_geracao == 'por_hora' and plano.frequencia:
-            # Para frequências horárias, trabalhar com datetime para suportar sub-dia
-            # Converter para datetime se for date
-            if hasattr(plano.data_inicio, 'date'):
-                data_atual = plano.data_inicio
-            else:
-                from datetime import datetime as dt
-                data_atual = dt.combine(plano.data_inicio, dt.min.time())
-            
-            # Limites em datetime
-            from datetime import datetime as dt
-            ultimo_momento = dt.combine(ultimo_dia, dt.max.time())
-            
-            # Continuar até passar do fim do ano atual
-            while data_atual <= ultimo_momento:
-                # Adicionar apenas datas dentro do ano atual
-                data_apenas = data_atual.date()
-                if primeiro_dia <= data_apenas <= ultimo_dia:
-                    # Adicionar apenas uma vez por dia (evitar duplicatas)
-                    if not datas_previstas or datas_previstas[-1] != data_apenas:
-                        datas_previstas.append(data_apenas)
-                data_atual = data_atual + timedelta(hours=plano.frequencia)
-        
-        elif plano.tipo_geracao == 'data_abertura':
-            # Apenas na data de início
-            # Converter datetime para date se necessário
-            data_inicio_date = plano.data_inicio.date() if hasattr(plano.data_inicio, 'date') else plano.data_inicio
-            if primeiro_dia <= data_inicio_date <= ultimo_dia:
-                datas_previstas.append(data_inicio_date)
-        
-        # Mapear datas para números de semana
-        semanas_execucao = set()
-        for data_prevista in datas_previstas:
-            # Encontrar em qual semana esta data cai
-            for semana in semanas:
-                if semana['inicio'] <= data_prevista <= semana['fim']:
-                    semanas_execucao.add(semana['numero'])
-                    break
-        
-        equipamento = plano.equipamento
-        if equipamento:
-            mapa_planos.append({
-                'plano': plano,
-                'equipamento_nome': equipamento.nome,
-                'equipamento_codigo': equipamento.codigo or '-',
-                'localizacao': f"{equipamento.subconjunto.conjunto.area.setor.empresa.nome} > {equipamento.subconjunto.conjunto.area.setor.nome}",
-                'semanas_execucao': sorted(semanas_execucao),
-                'total_execucoes': len(semanas_execucao)
-            })
-    
-    # Ordenar por localização e equipamento
-    mapa_planos.sort(key=lambda x: (x['localizacao'], x['equipamento_nome']))
+    # Linhas por plano vêm de mapa_anual_cache; só planos novos/alterados são recalculados
+    mapa_planos = montar_mapa_anual(ano_atual)
     
     return render_template('mapa_anual_planos.html', 
                          mapa_planos=mapa_planos, 
                          semanas=semanas,
                          ano_atual=ano_atual,
-                         semana_atual=hoje.isocalendar()[1])
+                         semana_atual=semana_iso_hoje if ano_iso_hoje == ano_atual else None)
 
 @main_bp.route('/planos', methods=['GET', 'POST'])
 @login_required
@@ -679,7 +614,8 @@ def planos():
 
     planos = PlanoInspecao.query.order_by(PlanoInspecao.data_criacao.desc()).all()
     equipamentos = Equipamento.query.order_by(Equipamento.nome).all()
-    return render_template('planos.html', planos=planos, equipamentos=equipamentos)
+    executantes = User.query.order_by(User.nome).all()
+    return render_template('planos.html', planos=planos, equipamentos=equipamentos, executantes=executantes)
 
 @main_bp.route('/planos/<int:plano_id>')
 @login_required
@@ -715,6 +651,10 @@ def editar_plano(plano_id):
                 db.session.commit()
                 flash('Item adicionado com sucesso!', 'success')
 
+        # Mapa anual: recalcular a linha deste plano na próxima visualização
+        invalidar_mapa_plano(plano.id)
+        db.session.commit()
+
         return redirect(url_for('main.editar_plano', plano_id=plano_id))
 
     return render_template('editar_plano.html', plano=plano)
@@ -724,7 +664,7 @@ def editar_plano(plano_id):
 @admin_required
 def deletar_plano(plano_id):
     plano = PlanoInspecao.query.get_or_404(plano_id)
-    db.session.delete(plano)
+    excluir_no(plano)
     db.session.commit()
     flash('Plano excluído com sucesso!', 'success')
     return redirect(url_for('main.planos'))
@@ -781,17 +721,47 @@ def gerar_ordem_automatica(plano_id):
     flash(f'Ordem gerada automaticamente para {data_programada.strftime("%d/%m/%Y %H:%M")}!', 'success')
     return redirect(url_for('main.ver_plano', plano_id=plano_id))
 
+@main_bp.route('/planos/gerar-ordens-lote', methods=['POST'])
+@login_required
+@admin_required
+def gerar_ordens_lote():
+    semanas = request.form.get('semanas', 4, type=int)
+    executante_id = request.form.get('executante_id', type=int)
+
+    if not semanas or not 1 <= semanas <= 52:
+        flash('Informe um horizonte entre 1 e 52 semanas.', 'warning')
+        return redirect(url_for('main.planos'))
+
+    resultado = gerar_ordens_em_lote(timedelta(weeks=semanas), executante_padrao_id=executante_id)
+
+    flash(f"{resultado['ordens']} ordens geradas para {resultado['planos']} planos nas próximas {semanas} semanas.", 'success')
+    if resultado['planos_sem_executante']:
+        flash(f"{resultado['planos_sem_executante']} planos sem ordens anteriores foram ignorados: selecione um executante padrão.", 'warning')
+    return redirect(url_for('main.planos'))
+
 @main_bp.route('/ordens')
 @login_required
 def ordens():
-    if current_user.is_admin():
-        ordens = OrdemExecucao.query.order_by(OrdemExecucao.data_programada.desc()).all()
-    else:
-        ordens = OrdemExecucao.query.filter_by(executante_id=current_user.id).order_by(OrdemExecucao.data_programada.desc()).all()
+    filtros = ler_filtros_ordens(request.args)
+    if not current_user.is_admin():
+        filtros['executante_id'] = current_user.id
+
+    query = OrdemExecucao.query.options(
+        joinedload(OrdemExecucao.plano).joinedload(PlanoInspecao.equipamento),
+        joinedload(OrdemExecucao.equipamento_direto),
+        joinedload(OrdemExecucao.executante)
+    )
+    query = filtrar_ordens(query, filtros)
+    ordens, proximo_cursor = paginar_ordens(query, request.args.get('cursor'), tamanho_pagina(request.args.get('limite')))
 
     empresas = Empresa.query.all()
     executantes = User.query.all()
-    return render_template('ordens.html', ordens=ordens, empresas=empresas, executantes=executantes)
+    # Filtros da listagem repassados aos links de exportação (sem os parâmetros de paginação e formato)
+    filtros_exportacao = {chave: valor for chave, valor in request.args.items()
+                          if chave not in ('cursor', 'limite', 'formato')}
+    return render_template('ordens.html', ordens=ordens, empresas=empresas, executantes=executantes,
+                           filtros=filtros, proximo_cursor=proximo_cursor, filtros_exportacao=filtros_exportacao,
+                           pagina_inicial=not request.args.get('cursor'))
 
 @main_bp.route('/ordens/criar-nao-programada', methods=['POST'])
 @login_required
@@ -829,26 +799,26 @@ def criar_ordem_nao_programada():
 @main_bp.route('/api/setores/<int:empresa_id>')
 @login_required
 def api_setores(empresa_id):
-    setores = Setor.query.filter_by(empresa_id=empresa_id).all()
-    return jsonify([{'id': s.id, 'nome': s.nome} for s in setores])
+    return resposta_cascata(('setores', empresa_id), lambda: setores_da_empresa(empresa_id))
 
 @main_bp.route('/api/areas/<int:setor_id>')
 @login_required
 def api_areas(setor_id):
-    areas = Area.query.filter_by(setor_id=setor_id).all()
-    return jsonify([{'id': a.id, 'nome': a.nome} for a in areas])
+    return resposta_cascata(('areas', setor_id), lambda: areas_do_setor(setor_id))
 
 @main_bp.route('/api/equipamentos/<int:area_id>')
 @login_required
 def api_equipamentos(area_id):
-    # Buscar todos os conjuntos da área
-    conjuntos = Conjunto.query.filter_by(area_id=area_id).all()
-    equipamentos = []
-    for conjunto in conjuntos:
-        for subconjunto in conjunto.subconjuntos:
-            for equip in subconjunto.equipamentos:
-                equipamentos.append({'id': equip.id, 'nome': equip.nome})
-    return jsonify(equipamentos)
+    return resposta_cascata(('equipamentos', area_id), lambda: equipamentos_da_area(area_id))
+
+@main_bp.route('/api/hierarquia/<tipo>/<int:no_id>/filhos')
+@login_required
+def api_hierarquia_filhos(tipo, no_id):
+    """Filhos diretos de um nó da hierarquia, com contagens, para a árvore de ver_empresa"""
+    filhos = filhos_do_no(tipo, no_id)
+    if filhos is None:
+        return jsonify({'error': 'Nível inválido'}), 404
+    return jsonify(filhos)
 
 @main_bp.route('/ordens/<int:ordem_id>')
 @login_required
@@ -895,36 +865,7 @@ def executar_ordem(ordem_id):
 
         # Processar checklist apenas para ordens programadas
         if ordem.tipo_ordem == 'programada' and ordem.plano and ordem.plano.itens:
-            for item in ordem.plano.itens:
-                resultado = request.form.get(f'resultado_{item.id}')
-                observacao = request.form.get(f'observacao_{item.id}')
-                valor_atual = request.form.get(f'valor_atual_{item.id}')
-
-                item_apontado = ItemInspecaoApontado.query.filter_by(
-                    ordem_id=ordem.id,
-                    item_inspecao_id=item.id
-                ).first()
-
-                if not item_apontado:
-                    item_apontado = ItemInspecaoApontado(
-                        ordem_id=ordem.id,
-                        item_inspecao_id=item.id
-                    )
-                    db.session.add(item_apontado)
-
-                item_apontado.resultado = resultado
-                item_apontado.observacao = observacao
-                item_apontado.valor_atual = float(valor_atual) if valor_atual else None
-
-                if resultado == 'nao_conforme':
-                    item_apontado.falha = request.form.get(f'falha_{item.id}')
-                    item_apontado.solucao = request.form.get(f'solucao_{item.id}')
-                    tempo = request.form.get(f'tempo_{item.id}')
-                    qtde = request.form.get(f'qtde_{item.id}')
-                    item_apontado.tempo_necessario = float(tempo) if tempo else None
-                    item_apontado.qtde_executantes = int(qtde) if qtde else None
-                    item_apontado.materiais = request.form.get(f'materiais_{item.id}')
-                    item_apontado.outros = request.form.get(f'outros_{item.id}')
+            salvar_apontamentos(ordem, ordem.plano.itens, request.form)
 
         if 'finalizar' in request.form:
             ordem.status = 'concluida'
@@ -946,12 +887,14 @@ def executar_ordem(ordem_id):
 # ==============================================================================
 @main_bp.route('/relatorios/planos/<int:plano_id>/pdf')
 @login_required
+@leitura_replica
 def relatorio_plano_pdf(plano_id):
     plano = PlanoInspecao.query.get_or_404(plano_id)
-    return gerar_pdf('relatorio_plano.html', plano=plano)
+    return resposta_pdf(None, 'relatorio_plano.html', plano=plano)
 
 @main_bp.route('/relatorios/planos/<int:plano_id>/excel')
 @login_required
+@leitura_replica
 def relatorio_plano_excel(plano_id):
     plano = PlanoInspecao.query.get_or_404(plano_id)
     data = []
@@ -964,14 +907,17 @@ def relatorio_plano_excel(plano_id):
             'Valor Máximo': item.valor_max or '-'
         })
 
-    df = pd.DataFrame(data)
-    return gerar_excel(df, filename=f'plano_{plano_id}_{plano.titulo}.xlsx')
+    return gerar_excel(data, filename=f'plano_{plano_id}_{plano.titulo}.xlsx')
 
 @main_bp.route('/relatorios/ordens/<int:ordem_id>/pdf')
 @login_required
+@leitura_replica
 def relatorio_ordem_pdf(ordem_id):
     from datetime import datetime
-    ordem = OrdemExecucao.query.get_or_404(ordem_id)
+    # Ordens não programadas chegam à empresa pelo setor gravado na própria ordem
+    ordem = OrdemExecucao.query.options(
+        joinedload(OrdemExecucao.setor).joinedload(Setor.empresa)
+    ).filter_by(id=ordem_id).first_or_404()
     
     # Construir caminho absoluto do logo se existir
     logo_path = None
@@ -979,7 +925,7 @@ def relatorio_ordem_pdf(ordem_id):
     
     # Determinar empresa baseado no tipo de ordem
     if ordem.tipo_ordem == 'programada' and ordem.plano and ordem.plano.equipamento:
-        empresa = ordem.plano.equipamento.subconjunto.conjunto.area.setor.empresa
+        empresa = ordem.plano.equipamento.empresa
     elif ordem.tipo_ordem == 'nao_programada' and ordem.setor:
         empresa = ordem.setor.empresa
     
@@ -992,10 +938,31 @@ def relatorio_ordem_pdf(ordem_id):
     else:
         template = 'relatorio_ordem.html'
     
-    return gerar_pdf(template, ordem=ordem, data_geracao=datetime.now(), logo_path=logo_path)
+    # Chave do cache: tudo o que aparece no relatório, o template e o arquivo do logo.
+    # Qualquer alteração na ordem, nos apontamentos ou no cadastro gera um novo PDF.
+    equipamento = ordem.plano.equipamento if ordem.plano else ordem.equipamento_direto
+    area = equipamento.area if equipamento else ordem.area
+    chave = chave_conteudo(
+        versao_template(template),
+        assinatura_arquivo(logo_path),
+        registro_como_dict(ordem),
+        registro_como_dict(ordem.executante),
+        registro_como_dict(ordem.plano),
+        registro_como_dict(equipamento),
+        registro_como_dict(area),
+        registro_como_dict(area.setor if area else None),
+        registro_como_dict(ordem.setor),
+        registro_como_dict(ordem.area),
+        registro_como_dict(empresa),
+        [(registro_como_dict(a), registro_como_dict(a.item_inspecao)) for a in ordem.itens_apontados]
+    )
+
+    return resposta_pdf(chave, template, ordem=ordem, empresa=empresa, data_geracao=datetime.now(),
+                        logo_path=logo_path)
 
 @main_bp.route('/relatorios/ordens/<int:ordem_id>/excel')
 @login_required
+@leitura_replica
 def relatorio_ordem_excel(ordem_id):
     ordem = OrdemExecucao.query.get_or_404(ordem_id)
     data = []
@@ -1014,112 +981,90 @@ def relatorio_ordem_excel(ordem_id):
             'Materiais': apontamento.materiais or '-'
         })
 
-    df = pd.DataFrame(data)
-    return gerar_excel(df, filename=f'ordem_{ordem_id}.xlsx')
+    return gerar_excel(data, filename=f'ordem_{ordem_id}.xlsx')
+
+@main_bp.route('/relatorios/ordens/exportar')
+@login_required
+@leitura_replica
+def exportar_ordens_relatorio():
+    """Todas as ordens do período (com os apontamentos) em XLSX ou CSV, enviadas em streaming"""
+    filtros = ler_filtros_ordens(request.args)
+    if not current_user.is_admin():
+        filtros['executante_id'] = current_user.id
+    formato = 'csv' if request.args.get('formato') == 'csv' else 'xlsx'
+    return exportar_ordens(filtros, formato)
 
 @main_bp.route('/relatorios/equipamentos/<int:equipamento_id>/pdf')
 @login_required
+@leitura_replica
 def relatorio_equipamento_pdf(equipamento_id):
     equipamento = Equipamento.query.get_or_404(equipamento_id)
     planos = PlanoInspecao.query.filter_by(equipamento_id=equipamento_id).all()
-    return gerar_pdf('relatorio_equipamento.html', equipamento=equipamento, planos=planos)
+    return resposta_pdf(None, 'relatorio_equipamento.html', equipamento=equipamento, planos=planos)
+
+# Relatórios renderizados fora da requisição (fila_pdf.py): a página de espera consulta o
+# status e baixa o arquivo quando pronto
+@main_bp.route('/relatorios/pdf/<chave>/status')
+@login_required
+def status_pdf(chave):
+    if not CHAVE_VALIDA.fullmatch(chave):
+        abort(404)
+    status, mensagem = situacao_pdf(chave)
+    if status is None:
+        return jsonify({'status': 'desconhecido'}), 404
+    resposta = {'status': status, 'fila': estatisticas_fila_pdf()['fila']}
+    if status == 'pronto':
+        resposta['download_url'] = url_for('main.baixar_pdf', chave=chave, nome=request.args.get('nome'))
+    elif status == 'erro':
+        resposta['mensagem'] = mensagem
+    return jsonify(resposta)
+
+@main_bp.route('/relatorios/pdf/<chave>')
+@login_required
+def baixar_pdf(chave):
+    if not CHAVE_VALIDA.fullmatch(chave) or situacao_pdf(chave)[0] != 'pronto':
+        abort(404)
+    resposta = enviar_pdf(chave, secure_filename(request.args.get('nome') or '') or 'relatorio.pdf')
+    if resposta is None:
+        abort(404)  # removido pela limpeza do cache; a página do relatório agenda de novo
+    return resposta
 
 # ==============================================================================
 # Rotas OTIMIZADAS de API para o Dashboard
 # ==============================================================================
 @main_bp.route('/api/dashboard/stats')
 @login_required
+@leitura_replica
 def dashboard_stats():
-    total_ordens = OrdemExecucao.query.count()
-    ordens_pendentes = OrdemExecucao.query.filter_by(status='pendente').count()
-    ordens_em_andamento = OrdemExecucao.query.filter_by(status='em_andamento').count()
-    ordens_concluidas = OrdemExecucao.query.filter_by(status='concluida').count()
-
-    # Agregação Mensal (Mantido o processamento Python)
-    todas_ordens = OrdemExecucao.query.all()
-    dados_mensais = {}
-
-    for ordem in todas_ordens:
-        data_ref = ordem.data_programada if ordem.data_programada else ordem.data_criacao
-        if data_ref:
-            data_ref = data_ref if isinstance(data_ref, datetime) else datetime(data_ref.year, data_ref.month, data_ref.day)
-
-            mes_str = data_ref.strftime('%m/%Y')
-            if mes_str not in dados_mensais:
-                dados_mensais[mes_str] = {'programadas': 0, 'realizadas': 0}
-
-            dados_mensais[mes_str]['programadas'] += 1
-            if ordem.status == 'concluida':
-                dados_mensais[mes_str]['realizadas'] += 1
-
-    meses_ordenados = sorted(dados_mensais.keys(), key=lambda x: datetime.strptime(x, '%m/%Y'))
-    meses = meses_ordenados[-6:] if len(meses_ordenados) > 6 else meses_ordenados
-
-    programadas_mensal = [dados_mensais[m]['programadas'] for m in meses]
-    realizadas_mensal = [dados_mensais[m]['realizadas'] for m in meses]
-    percentual_mensal = [round((dados_mensais[m]['realizadas'] / dados_mensais[m]['programadas'] * 100), 1) if dados_mensais[m]['programadas'] > 0 else 0 for m in meses]
-
-    # OTIMIZAÇÃO CRÍTICA: Estatísticas por Equipamento (Agregação no PostgreSQL)
-    equipamentos_data_agregada = db.session.query(
-        Equipamento.nome,
-        Equipamento.codigo,
-        func.count(OrdemExecucao.id).label('total_programadas'),
-        func.sum(db.case((OrdemExecucao.status == 'concluida', 1), else_=0)).label('total_realizadas')
-    ).select_from(Equipamento).outerjoin(PlanoInspecao).outerjoin(OrdemExecucao).group_by(
-        Equipamento.id, Equipamento.nome, Equipamento.codigo
-    ).all()
-
-    equipamentos_stats = []
-    for nome, codigo, total_programadas, total_realizadas in equipamentos_data_agregada:
-        percentual = round((total_realizadas / total_programadas * 100), 1) if total_programadas > 0 else 0
-
-        equipamentos_stats.append({
-            'equipamento': nome,
-            'codigo': codigo or '-',
-            'programadas': total_programadas,
-            'realizadas': total_realizadas,
-            'percentual': percentual
-        })
-
-    equipamentos_stats.sort(key=lambda x: x['percentual'], reverse=True)
-
+    resumo = resumo_dashboard()
     return jsonify({
-        'ordens': {
-            'total': total_ordens,
-            'pendentes': ordens_pendentes,
-            'em_andamento': ordens_em_andamento,
-            'concluidas': ordens_concluidas
-        },
-        'equipamentos': equipamentos_stats,
-        'mensal': {
-            'meses': meses,
-            'programadas': programadas_mensal,
-            'realizadas': realizadas_mensal,
-            'percentual': percentual_mensal
-        }
+        'ordens': resumo['ordens'],
+        'equipamentos': resumo['equipamentos'],
+        'mensal': resumo['mensal']
     })
 
+@main_bp.route('/api/dashboard/resumo')
+@login_required
+@leitura_replica
+def dashboard_resumo():
+    """API consolidada do dashboard: contadores, tipos, não programadas, equipamentos e série mensal"""
+    return jsonify(resumo_dashboard())
+
 @main_bp.route('/api/dashboard/ordens')
 @login_required
+@leitura_replica
 def dashboard_ordens():
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
+    filtros = ler_filtros_ordens(request.args)
 
     # OTIMIZAÇÃO CRÍTICA: Eager Loading (joinedload) para carregar relações em poucas queries.
     query = OrdemExecucao.query.options(
         joinedload(OrdemExecucao.plano).joinedload(PlanoInspecao.equipamento),
         joinedload(OrdemExecucao.executante)
     )
+    query = filtrar_ordens(query, filtros)
 
-    if data_inicio:
-        data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
-        query = query.filter(OrdemExecucao.data_programada >= data_inicio_obj)
-
-    if data_fim:
-        data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1, seconds=-1) 
-        query = query.filter(OrdemExecucao.data_programada <= data_fim_obj)
-
-    ordens = query.order_by(OrdemExecucao.data_programada.desc()).all()
+    # Paginação por cursor: o tamanho da resposta não cresce com o histórico
+    ordens, proximo_cursor = paginar_ordens(query, request.args.get('cursor'), tamanho_pagina(request.args.get('limite')))
 
     ordens_lista = []
     hoje_date = datetime.now().date() 
@@ -1157,33 +1102,21 @@ def dashboard_ordens():
             'status_visual': status_visual
         })
 
-    return jsonify(ordens_lista)
+    return jsonify({'ordens': ordens_lista, 'proximo_cursor': proximo_cursor})
 
 @main_bp.route('/api/dashboard/tipo-ordem')
 @login_required
+@leitura_replica
 def dashboard_tipo_ordem():
     """API para retornar dados de ordens programadas vs não programadas"""
-    total_programadas = OrdemExecucao.query.filter_by(tipo_ordem='programada').count()
-    total_nao_programadas = OrdemExecucao.query.filter_by(tipo_ordem='nao_programada').count()
-    
-    return jsonify({
-        'programadas': total_programadas,
-        'nao_programadas': total_nao_programadas
-    })
+    return jsonify(contagem_ordens_cache()['tipo_ordem'])
 
 @main_bp.route('/api/dashboard/nao-programadas-status')
 @login_required
+@leitura_replica
 def dashboard_nao_programadas_status():
     """API para retornar status de ordens não programadas"""
-    nao_programadas_pendentes = OrdemExecucao.query.filter_by(tipo_ordem='nao_programada', status='pendente').count()
-    nao_programadas_em_andamento = OrdemExecucao.query.filter_by(tipo_ordem='nao_programada', status='em_andamento').count()
-    nao_programadas_concluidas = OrdemExecucao.query.filter_by(tipo_ordem='nao_programada', status='concluida').count()
-    
-    return jsonify({
-        'pendentes': nao_programadas_pendentes,
-        'em_andamento': nao_programadas_em_andamento,
-        'concluidas': nao_programadas_concluidas
-    })
+    return jsonify(contagem_ordens_cache()['nao_programadas'])
 
 # ==============================================================================
 # Rotas de CRUD de Usuários
@@ -1238,6 +1171,27 @@ def novo_usuario():
 
     return render_template('editar_usuario.html', usuario=None)
 
+@main_bp.route('/usuarios/importar', methods=['POST'])
+@login_required
+@admin_required
+def importar_usuarios_planilha():
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        flash('Selecione um arquivo .xlsx ou .csv para importar.', 'danger')
+        return redirect(url_for('main.usuarios'))
+
+    try:
+        resultado = importar_usuarios(ler_planilha(arquivo.stream, arquivo.filename))
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Erro ao importar: {e}', 'danger')
+        return redirect(url_for('main.usuarios'))
+
+    flash(f"{resultado['importados']} de {resultado['linhas']} usuários importados.",
+          'success' if not resultado['erros'] else 'warning')
+    usuarios = User.query.order_by(User.nome).all()
+    return render_template('usuarios.html', usuarios=usuarios, importacao=resultado)
+
 @main_bp.route('/usuarios/<int:usuario_id>/editar', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -1276,6 +1230,7 @@ def editar_usuario(usuario_id):
             usuario.set_password(password)
 
         db.session.commit()
+        invalidar_usuario(usuario.id)
 
         flash('Usuário atualizado com sucesso!', 'success')
         return redirect(url_for('main.usuarios'))
@@ -1294,6 +1249,28 @@ def deletar_usuario(usuario_id):
 
     db.session.delete(usuario)
     db.session.commit()
+    invalidar_usuario(usuario_id)
 
     flash('Usuário excluído com sucesso!', 'success')
-    return redirect(url_for('main.usuarios'))
\ No newline at end of file
+    return redirect(url_for('main.usuarios'))
+
+# ==============================================================================
+# Diagnóstico de SQL (consultas por rota, medidas em diagnostico_sql.py)
+# ==============================================================================
+@main_bp.route('/admin/diagnostico-sql')
+@login_required
+@admin_required
+def diagnostico_sql():
+    rotas, recentes = estatisticas_sql.resumo()
+    return render_template('diagnostico_sql.html', rotas=rotas, recentes=recentes,
+                           limite=current_app.config.get('DIAGNOSTICO_SQL_LIMITE_CONSULTAS', 20),
+                           ativo=current_app.config.get('DIAGNOSTICO_SQL', False),
+                           fila_pdf=estatisticas_fila_pdf())
+
+@main_bp.route('/admin/diagnostico-sql/limpar', methods=['POST'])
+@login_required
+@admin_required
+def limpar_diagnostico_sql():
+    estatisticas_sql.limpar()
+    flash('Estatísticas de SQL zeradas.', 'info')
+    return redirect(url_for('main.diagnostico_sql'))
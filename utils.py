@@ -1,22 +1,25 @@
-from flask import render_template, make_response
-import pandas as pd
+from flask import make_response
 from io import BytesIO
-from weasyprint import HTML
 
-def gerar_pdf(template, **kwargs):
-    """Gera um PDF a partir de um template HTML"""
-    html_out = render_template(template, **kwargs)
-    pdf = HTML(string=html_out).write_pdf()
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'inline; filename=relatorio.pdf'
-    return response
+# pandas e WeasyPrint são importados dentro das funções: só os relatórios usam,
+# e carregá-los no import do módulo pesa no boot e na memória de cada worker
+
+def pdf_do_html(html_out, template=None):
+    """Bytes do PDF de um HTML já renderizado, com a folha de estilos do template.
+
+    Não depende do app: roda também no pool de PDFs.
+    """
+    from contexto_pdf import contexto_pdf
+
+    return contexto_pdf().renderizar(html_out, template)
+
+def gerar_excel(registros, filename='relatorio.xlsx'):
+    """Gera um arquivo Excel a partir de uma lista de dicts (uma linha por dict)"""
+    import pandas as pd
 
-def gerar_excel(dataframe, filename='relatorio.xlsx'):
-    """Gera um arquivo Excel a partir de um DataFrame do pandas"""
     output = BytesIO()
     writer = pd.ExcelWriter(output, engine='openpyxl')
-    dataframe.to_excel(writer, index=False, sheet_name='Relatório')
+    pd.DataFrame(registros).to_excel(writer, index=False, sheet_name='Relatório')
     writer.close()
     output.seek(0)
     response = make_response(output.read())
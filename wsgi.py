@@ -0,0 +1,5 @@
+# Ponto de entrada WSGI de produção: gunicorn -c gunicorn.conf.py wsgi:app
+# (app.py continua sendo o servidor de desenvolvimento)
+from app import create_app
+
+app = create_app()